@@ -0,0 +1,10 @@
+from django.urls import include, path
+
+from api.async_views import async_read_urls
+from api.urls import router_v1
+
+urlpatterns = [
+    path('', include(async_read_urls(router_v1.urls))),
+    path('', include('djoser.urls')),
+    path('auth/', include('djoser.urls.authtoken')),
+]
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import FileResponse
+from django.urls import URLPattern
+
+from api_foodgram.settings import ASYNC_READ_WORKERS
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Имена маршрутов DefaultRouter, чтение которых идёт по async-пути
+ASYNC_READ_ROUTES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-search',
+    'recipes-cookable',
+    'recipes-feed',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'customuser-subscriptions',
+    # Потоковая выгрузка читает базу в генераторе, а ожидание рендера PDF
+    # не должно занимать общий sync-поток
+    'recipes-download-shopping-cart',
+    'recipes-shopping-cart-pdf',
+)
+
+# Свой пул, чтобы число одновременных соединений с БД на процесс
+# было ограничено ASYNC_READ_WORKERS
+read_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_READ_WORKERS, thread_name_prefix='async-read'
+)
+
+
+def _read(view, request, *args, **kwargs):
+    # Поток пула живёт дольше запроса, поэтому соединения с БД
+    # закрываются здесь, как это делают сигналы request_started/finished
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        elif response.streaming and not isinstance(response, FileResponse):
+            # ASGIHandler дочитывает потоковый ответ в цикле событий, где
+            # ORM недоступен, поэтому генератор с запросами к базе
+            # выбирается здесь. Файлы базу не читают и остаются потоком.
+            response.streaming_content = list(response.streaming_content)
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Async-версия view DRF для ASGI.
+
+    В Django 3.2 нет асинхронного ORM, поэтому чтение выполняется в пуле
+    потоков (sync_to_async с thread_sensitive=False), и один медленный
+    запрос не держит остальные. Запись идёт прежним синхронным путём в
+    общем потоке Django: транзакции и on_commit работают как под WSGI.
+    """
+    read = sync_to_async(
+        partial(_read, view), thread_sensitive=False, executor=read_executor
+    )
+    write = sync_to_async(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_read_urls(patterns):
+    return [
+        URLPattern(
+            pattern.pattern, async_read_view(pattern.callback),
+            pattern.default_args, pattern.name
+        ) if pattern.name in ASYNC_READ_ROUTES else pattern
+        for pattern in patterns
+    ]
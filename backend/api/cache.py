@@ -0,0 +1,281 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Value
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from api.metrics import CACHE_REQUESTS
+from api_foodgram.settings import (CACHE_VERSION_TIMEOUT,
+                                   CATALOG_CACHE_MAX_AGE,
+                                   RESPONSE_CACHE_TIMEOUT,
+                                   USER_RELATIONS_CACHE_TIMEOUT)
+from recipes.models import Favorite, Follow, ShoppingCart
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+
+RESPONSE_CACHE_STATS = ('hits', 'misses', 'hit_us', 'miss_us', 'bytes')
+
+FAVORITES, SHOPPING_CART, FOLLOWING = range(3)
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _version_timeout():
+    return CACHE_VERSION_TIMEOUT or None
+
+
+def get_version(namespace):
+    """Текущая версия справочника (метка времени последнего изменения, мс).
+
+    Если ключ пропал из кеша, версия начинается с текущего времени,
+    так что старые ETag гарантированно перестают совпадать. Ключ живёт
+    CACHE_VERSION_TIMEOUT секунд: с кешем в памяти процесса изменение
+    поднимает версию только в одном воркере, а остальные получают новую
+    версию, когда истечёт их ключ.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_ms(), timeout=_version_timeout())
+        return cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    cache.set(
+        _version_key(namespace),
+        max(_now_ms(), get_version(namespace) + 1),
+        timeout=_version_timeout()
+    )
+
+
+class CatalogCacheMixin:
+    """Условные GET и версионный кеш ответов для справочников."""
+    cache_namespace = None
+
+    def cached_response(self, request, get_data):
+        version = get_version(self.cache_namespace)
+        etag = (f'"{self.cache_namespace}-{version}-'
+                f'{request.accepted_renderer.format}"')
+        last_modified = version // 1000
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = (f'catalog:{self.cache_namespace}:{version}:'
+                   f'{request.accepted_renderer.format}:'
+                   f'{request.get_full_path()}')
+            data = cache.get(key)
+            if data is None:
+                CACHE_REQUESTS.inc(cache=self.cache_namespace, result='miss')
+                data = get_data()
+                cache.set(key, data)
+            else:
+                CACHE_REQUESTS.inc(cache=self.cache_namespace, result='hit')
+            response = Response(data)
+        else:
+            CACHE_REQUESTS.inc(
+                cache=self.cache_namespace, result='not_modified'
+            )
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=CATALOG_CACHE_MAX_AGE
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CatalogCacheMixin, self).list(
+                request, *args, **kwargs
+            ).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CatalogCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            ).data
+        )
+
+
+def _stats_key(namespace, name):
+    return f'response-stats:{namespace}:{name}'
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def get_response_stats(namespace):
+    """Счётчики кеша ответов: попадания, промахи, время (мкс) и объём."""
+    values = cache.get_many(
+        [_stats_key(namespace, name) for name in RESPONSE_CACHE_STATS]
+    )
+    return {
+        name: values.get(_stats_key(namespace, name), 0)
+        for name in RESPONSE_CACHE_STATS
+    }
+
+
+def reset_response_stats(namespace):
+    cache.delete_many(
+        [_stats_key(namespace, name) for name in RESPONSE_CACHE_STATS]
+    )
+
+
+class AnonymousResponseCacheMixin:
+    """Кеш готовых JSON-ответов для анонимных GET-запросов.
+
+    Ответ одинаков для всех анонимов, поэтому ключ строится только из
+    версии namespace и нормализованных параметров запроса. Версию
+    поднимают сигналы при изменении данных, а старые ключи просто
+    истекают по RESPONSE_CACHE_TIMEOUT.
+    """
+    response_cache_namespace = None
+    # Параметры, которые для анонима ни на что не влияют.
+    response_cache_ignored_params = ()
+
+    def get_response_cache_key(self, request, version):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in self.response_cache_ignored_params
+            for value in values
+            if value
+        )
+        query = hashlib.md5(
+            f'{request.get_host()}{request.path}?{urlencode(params)}'.encode()
+        ).hexdigest()
+        return f'response:{self.response_cache_namespace}:{version}:{query}'
+
+    def anonymous_cached_response(self, request, get_response):
+        if (request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return get_response()
+
+        started = time.perf_counter()
+        namespace = self.response_cache_namespace
+        key = self.get_response_cache_key(request, get_version(namespace))
+        content = cache.get(key)
+        if content is not None:
+            _incr(_stats_key(namespace, 'hits'), 1)
+            CACHE_REQUESTS.inc(cache=f'{namespace}-response', result='hit')
+            outcome = 'hit_us'
+        else:
+            response = get_response()
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            cache.set(key, content, RESPONSE_CACHE_TIMEOUT)
+            _incr(_stats_key(namespace, 'misses'), 1)
+            CACHE_REQUESTS.inc(cache=f'{namespace}-response', result='miss')
+            _incr(_stats_key(namespace, 'bytes'), len(content))
+            outcome = 'miss_us'
+        _incr(
+            _stats_key(namespace, outcome),
+            int((time.perf_counter() - started) * 1_000_000)
+        )
+        return HttpResponse(content, content_type=request.accepted_media_type)
+
+    def list(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            request, lambda: super(AnonymousResponseCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            request, lambda: super(AnonymousResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+
+class UserRelations:
+    """Избранное, корзина и подписки пользователя в виде множеств id."""
+
+    def __init__(self, favorites=(), shopping_cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.following = frozenset(following)
+
+    @classmethod
+    def load(cls, user_id):
+        """Читает все три множества одним запросом UNION ALL."""
+        related = {FAVORITES: [], SHOPPING_CART: [], FOLLOWING: []}
+        rows = Favorite.objects.filter(user_id=user_id).annotate(
+            kind=Value(FAVORITES)
+        ).values_list('kind', 'recipe_id').order_by().union(
+            ShoppingCart.objects.filter(user_id=user_id).annotate(
+                kind=Value(SHOPPING_CART)
+            ).values_list('kind', 'recipe_id').order_by(),
+            Follow.objects.filter(user_id=user_id).annotate(
+                kind=Value(FOLLOWING)
+            ).values_list('kind', 'author_id').order_by(),
+            all=True
+        )
+        for kind, related_id in rows:
+            related[kind].append(related_id)
+        return cls(
+            related[FAVORITES], related[SHOPPING_CART], related[FOLLOWING]
+        )
+
+
+def _user_relations_key(user_id):
+    return f'user-relations:{user_id}'
+
+
+def get_user_relations(request):
+    """Связи текущего пользователя: загружаются один раз на запрос.
+
+    При USER_RELATIONS_CACHE_TIMEOUT > 0 они ещё и хранятся в общем кеше
+    между запросами до первой записи в Favorite/ShoppingCart/Follow.
+    """
+    relations = getattr(request, 'user_relations', None)
+    if relations is not None:
+        return relations
+    user = request.user
+    if not user.is_authenticated:
+        relations = UserRelations()
+    elif USER_RELATIONS_CACHE_TIMEOUT:
+        key = _user_relations_key(user.id)
+        relations = cache.get(key)
+        if relations is None:
+            CACHE_REQUESTS.inc(cache='user-relations', result='miss')
+            relations = UserRelations.load(user.id)
+            cache.set(key, relations, USER_RELATIONS_CACHE_TIMEOUT)
+        else:
+            CACHE_REQUESTS.inc(cache='user-relations', result='hit')
+    else:
+        relations = UserRelations.load(user.id)
+    request.user_relations = relations
+    return relations
+
+
+def invalidate_user_relations(user_id):
+    if USER_RELATIONS_CACHE_TIMEOUT:
+        cache.delete(_user_relations_key(user_id))
@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from itertools import compress
+
+from api_foodgram.settings import COOKABLE_INDEX_TTL, COOKABLE_MAX_MISSING
+from recipes.models import RecipeIngredient
+
+# Ингредиент, который есть больше чем в 1/DENSE_SHARE рецептов, хранится
+# плотно: по байту на рецепт в одном большом int
+DENSE_SHARE = 64
+# Число ингредиентов рецепта хранится в байте
+MAX_RECIPE_SIZE = 255
+
+_POSITIVE = bytes([0] + [1] * 255)
+_EQUAL = tuple(
+    bytes(int(value == missing) for value in range(256))
+    for missing in range(COOKABLE_MAX_MISSING + 1)
+)
+
+
+def _to_int(data):
+    return int.from_bytes(data, 'little')
+
+
+class Matches(Sequence):
+    """Результат CookableIndex.match(): пары (id рецепта, отсортированные
+    id недостающих ингредиентов) по рангу. Пары создаются только для
+    запрошенного среза, поэтому страница из тысяч совпадений дешёвая.
+    Недостающие берутся из того же снимка, по которому шло ранжирование.
+    """
+
+    def __init__(self, postings, ingredient_ids, levels):
+        self._postings = postings
+        self._ingredient_ids = frozenset(ingredient_ids)
+        self._positions = []
+        for positions in levels:
+            self._positions.extend(positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        recipe_id = self._postings.ids[self._positions[index]]
+        ingredients = self._postings.recipes.get(recipe_id, frozenset())
+        return recipe_id, sorted(ingredients - self._ingredient_ids)
+
+
+class _Postings:
+    """Позиции рецептов и списки ингредиентов одного снимка индекса.
+
+    У каждого рецепта своя позиция p, в sizes[p] — число его
+    ингредиентов. Частые ингредиенты хранятся в dense как int, где байт p
+    равен 1, если ингредиент есть в рецепте: сложение таких чисел
+    даёт по байту на рецепт число совпадений без цикла на Python.
+    Редкие хранятся в sparse множеством позиций.
+    """
+
+    def __init__(self):
+        self.built_at = time.monotonic()
+        self.recipes = {}
+        self.positions = {}
+        self.ids = []
+        self.sizes = bytearray()
+        self.dense = {}
+        self.sparse = defaultdict(set)
+
+    def _add(self, ingredient_id, position):
+        if ingredient_id in self.dense:
+            self.dense[ingredient_id] += 1 << (8 * position)
+        else:
+            self.sparse[ingredient_id].add(position)
+
+    def _discard(self, ingredient_id, position):
+        if ingredient_id in self.dense:
+            self.dense[ingredient_id] -= 1 << (8 * position)
+        else:
+            self.sparse[ingredient_id].discard(position)
+
+    def set(self, recipe_id, ingredient_ids):
+        if len(ingredient_ids) > MAX_RECIPE_SIZE:
+            ingredient_ids = frozenset()
+        old = self.recipes.get(recipe_id, frozenset())
+        position = self.positions.get(recipe_id)
+        if position is None:
+            if not ingredient_ids:
+                return
+            # Позиции удалённых рецептов освобождаются при перестройке
+            position = self.positions[recipe_id] = len(self.ids)
+            self.ids.append(recipe_id)
+            self.sizes.append(0)
+        for ingredient_id in old - ingredient_ids:
+            self._discard(ingredient_id, position)
+        for ingredient_id in ingredient_ids - old:
+            self._add(ingredient_id, position)
+        self.sizes[position] = len(ingredient_ids)
+        if ingredient_ids:
+            self.recipes[recipe_id] = ingredient_ids
+        else:
+            self.recipes.pop(recipe_id, None)
+
+    @classmethod
+    def build(cls, recipes):
+        postings = cls()
+        counts = defaultdict(int)
+        for recipe_id in sorted(recipes):
+            ingredient_ids = frozenset(recipes[recipe_id])
+            if not ingredient_ids or len(ingredient_ids) > MAX_RECIPE_SIZE:
+                continue
+            postings.positions[recipe_id] = len(postings.ids)
+            postings.ids.append(recipe_id)
+            postings.sizes.append(len(ingredient_ids))
+            postings.recipes[recipe_id] = ingredient_ids
+            for ingredient_id in ingredient_ids:
+                counts[ingredient_id] += 1
+
+        threshold = max(1, len(postings.ids) // DENSE_SHARE)
+        dense = defaultdict(lambda: bytearray(len(postings.ids)))
+        for recipe_id, ingredient_ids in postings.recipes.items():
+            position = postings.positions[recipe_id]
+            for ingredient_id in ingredient_ids:
+                if counts[ingredient_id] > threshold:
+                    dense[ingredient_id][position] = 1
+                else:
+                    postings.sparse[ingredient_id].add(position)
+        postings.dense = {
+            ingredient_id: _to_int(flags)
+            for ingredient_id, flags in dense.items()
+        }
+        return postings
+
+
+class CookableIndex:
+    """Индекс «что приготовить из того, что есть» в памяти процесса.
+
+    Запрос не делает GROUP BY по RecipeIngredient: совпадения считаются
+    сложением плотных списков частых ингредиентов и проходом по коротким
+    спискам редких. Изменения рецептов этого процесса вносятся точечно
+    через update() и remove(); изменения из других процессов подхватывает
+    полная перестройка раз в COOKABLE_INDEX_TTL секунд, которую делает
+    один запрос, пока остальные отвечают по старому снимку.
+    """
+
+    def __init__(self, ttl=COOKABLE_INDEX_TTL):
+        self.ttl = ttl
+        self._build_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._postings = None
+        # Рецепты, изменённые во время перестройки
+        self._touched = None
+
+    def _is_fresh(self, postings):
+        return (
+            postings is not None
+            and time.monotonic() - postings.built_at < self.ttl
+        )
+
+    def _rebuild(self):
+        with self._write_lock:
+            self._touched = set()
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            recipes[recipe_id].add(ingredient_id)
+        postings = _Postings.build(recipes)
+        with self._write_lock:
+            touched, self._touched = self._touched, None
+            self._postings = postings
+        for recipe_id in touched:
+            self.update(recipe_id)
+
+    def _get_postings(self):
+        postings = self._postings
+        if self._is_fresh(postings):
+            return postings
+        # Без снимка ждут все, устаревший перестраивает один поток
+        if self._build_lock.acquire(blocking=postings is None):
+            try:
+                if not self._is_fresh(self._postings):
+                    self._rebuild()
+            finally:
+                self._build_lock.release()
+        return self._postings or postings
+
+    def _set(self, recipe_id, ingredient_ids):
+        with self._write_lock:
+            if self._touched is not None:
+                self._touched.add(recipe_id)
+            if self._postings is not None:
+                self._postings.set(recipe_id, ingredient_ids)
+
+    def update(self, recipe_id):
+        """Перечитывает ингредиенты одного рецепта."""
+        if self._postings is None and self._touched is None:
+            return
+        self._set(recipe_id, frozenset(RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True)))
+
+    def remove(self, recipe_id):
+        self._set(recipe_id, frozenset())
+
+    def match(self, ingredient_ids, max_missing):
+        """Matches: рецепты, где есть хотя бы один ингредиент из набора
+        и не хватает не больше max_missing (не больше COOKABLE_MAX_MISSING).
+
+        Сначала готовые целиком, затем по числу недостающих и по доле
+        имеющихся; при равенстве новые рецепты раньше.
+        """
+        postings = self._get_postings()
+        with self._write_lock:
+            size = len(postings.ids)
+            sizes = bytes(postings.sizes)
+            dense = [
+                postings.dense[ingredient_id]
+                for ingredient_id in ingredient_ids
+                if ingredient_id in postings.dense
+            ]
+            sparse = [
+                tuple(postings.sparse[ingredient_id])
+                for ingredient_id in ingredient_ids
+                if ingredient_id in postings.sparse
+            ]
+        if not size:
+            return Matches(postings, ingredient_ids, ())
+
+        # Байт p — сколько ингредиентов рецепта p есть в наборе
+        counts = bytearray(sum(dense).to_bytes(size, 'little'))
+        for positions in sparse:
+            for position in positions:
+                counts[position] += 1
+        # sizes[p] >= counts[p], поэтому вычитание идёт без заёма
+        missing = (_to_int(sizes) - _to_int(counts)).to_bytes(size, 'little')
+        matched = _to_int(counts.translate(_POSITIVE))
+
+        levels = []
+        for level in range(min(max_missing, COOKABLE_MAX_MISSING) + 1):
+            flags = (
+                _to_int(missing.translate(_EQUAL[level])) & matched
+            ).to_bytes(size, 'little')
+            positions = list(compress(range(size), flags))
+            if level:
+                # Доля имеющихся растёт вместе с числом совпадений
+                positions.sort(key=counts.__getitem__)
+            positions.reverse()
+            levels.append(positions)
+        return Matches(postings, ingredient_ids, levels)
+
+
+cookable_index = CookableIndex()
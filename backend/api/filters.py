@@ -1,6 +1,7 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Recipe, Tag
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
 from users.models import CustomUser
 
 
@@ -9,7 +10,8 @@ class TagFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -20,13 +22,30 @@ class TagFilter(filters.FilterSet):
         model = Recipe
         fields = ('author', 'tags',)
 
-    def filter_is_favorited(self, queryset, name, value):
+    def filter_tags(self, queryset, name, value):
+        # EXISTS вместо JOIN: рецепт с несколькими тегами не дублируется
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef('pk'), tag__in=value
+                )
+            ))
+        return queryset
+
+    def filter_is_favorited(self, queryset, name, value):
+        user = self.request.user
+        if value and not user.is_anonymous:
+            return queryset.filter(Exists(
+                Favorite.objects.filter(user=user, recipe_id=OuterRef('pk'))
+            ))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe_id=OuterRef('pk')
+                )
+            ))
         return queryset
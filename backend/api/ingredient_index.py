@@ -0,0 +1,74 @@
+import threading
+from bisect import bisect_left
+
+from api.cache import INGREDIENTS, get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Префиксный индекс по названиям ингредиентов в памяти процесса.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    версия справочника INGREDIENTS: её поднимают сигналы, в том числе в
+    других процессах, если кеш общий. Поэтому ответ, закешированный под
+    новой версией, не собирается из старого снимка.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    @staticmethod
+    def _is_fresh(snapshot, version):
+        return snapshot is not None and snapshot['version'] == version
+
+    def _build(self, version):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].lower(), row['id'])
+        )
+        return {
+            'version': version,
+            'keys': [row['name'].lower() for row in rows],
+            'rows': rows,
+        }
+
+    def _get_snapshot(self):
+        # Версия читается до выборки: изменение во время сборки даст
+        # новую версию, и снимок перестроится при следующем запросе
+        version = get_version(INGREDIENTS)
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            return snapshot
+        with self._lock:
+            if not self._is_fresh(self._snapshot, version):
+                self._snapshot = self._build(version)
+            return self._snapshot
+
+    def search(self, query, limit):
+        """Сначала совпадения по началу названия, затем по вхождению."""
+        snapshot = self._get_snapshot()
+        keys, rows = snapshot['keys'], snapshot['rows']
+        query = query.strip().lower()
+        if not query:
+            return rows[:]
+
+        result = []
+        index = bisect_left(keys, query)
+        while (index < len(keys) and keys[index].startswith(query)
+               and len(result) < limit):
+            result.append(rows[index])
+            index += 1
+        if len(result) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
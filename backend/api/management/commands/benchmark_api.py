@@ -0,0 +1,338 @@
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from io import BytesIO
+
+import django
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.paginations import Paginate
+from recipes.counters import recount
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import CustomUser
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+IMAGE_NAME = 'benchmark.png'
+BATCH_SIZE = 1000
+
+
+def zipf_weights(count, exponent=1.1):
+    """Веса «популярности»: немногие авторы и рецепты собирают большинство
+    подписок и добавлений в избранное, как в живых данных."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def sample(rng, population, weights, count):
+    chosen = set()
+    for _ in range(count * 3):
+        if len(chosen) == count:
+            break
+        chosen.add(rng.choices(population, weights)[0])
+    return chosen
+
+
+class Seeder:
+    """Синтетический набор данных. Всё пишется bulk_create, поэтому
+    сигналы не срабатывают, а счётчики пересчитываются в конце."""
+
+    def __init__(self, users, recipes, seed):
+        self.users_count = users
+        self.recipes_count = recipes
+        self.rng = random.Random(seed)
+
+    def run(self):
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', verbosity=0)
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tags = [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )[0]
+            for name, color, slug in TAGS
+        ]
+        image = BytesIO()
+        Image.new('RGB', (64, 64), '#E26C2D').save(image, 'PNG')
+        default_storage.save(IMAGE_NAME, ContentFile(image.getvalue()))
+
+        users = CustomUser.objects.bulk_create(
+            CustomUser(
+                username=f'bench{index}', email=f'bench{index}@example.com',
+                first_name='Имя', last_name='Фамилия',
+                password='!'
+            )
+            for index in range(self.users_count)
+        )
+        if not users[0].pk:
+            # SQLite до Django 4 не возвращает id из bulk_create
+            users = list(CustomUser.objects.filter(
+                username__startswith='bench'
+            ).order_by('id'))
+        author_weights = zipf_weights(len(users))
+
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=self.rng.choices(users, author_weights)[0],
+                    name=f'Рецепт {index}',
+                    text='Описание рецепта. ' * self.rng.randint(5, 40),
+                    image=IMAGE_NAME,
+                    cooking_time=self.rng.randint(5, 180)
+                )
+                for index in range(self.recipes_count)
+            ),
+            batch_size=BATCH_SIZE
+        )
+        if not recipes[0].pk:
+            recipes = list(Recipe.objects.order_by('id'))
+        recipe_weights = zipf_weights(len(recipes))
+
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe in recipes
+                for tag in self.rng.sample(tags, self.rng.randint(1, 3))
+            ),
+            batch_size=BATCH_SIZE
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids, self.rng.randint(3, 12)
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+        favorites, carts, follows = [], [], []
+        for user in users:
+            for recipe in sample(self.rng, recipes, recipe_weights,
+                                 self.rng.randint(0, 30)):
+                favorites.append(Favorite(user=user, recipe=recipe))
+            for recipe in sample(self.rng, recipes, recipe_weights,
+                                 self.rng.randint(0, 12)):
+                carts.append(ShoppingCart(user=user, recipe=recipe))
+            for author in sample(self.rng, users, author_weights,
+                                 self.rng.randint(0, 20)):
+                if author != user:
+                    follows.append(Follow(user=user, author=author))
+        for model, objs in ((Favorite, favorites), (ShoppingCart, carts),
+                            (Follow, follows)):
+            model.objects.bulk_create(
+                objs, batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+        recount(apps)
+
+        # Замеры идут от имени самого активного пользователя
+        activity = Counter(obj.user_id for obj in carts + follows)
+        self.user = max(users, key=lambda user: activity[user.id])
+        self.author = users[0]
+        self.recipe = recipes[0]
+        return self
+
+
+def scenarios(data):
+    """(имя, URL, аноним, чистить ли кеш перед каждым запросом)"""
+    recipe_id, author_id = data.recipe.id, data.author.id
+    # Последняя страница списка: OFFSET растёт вместе с числом рецептов
+    last_page = max(1, math.ceil(data.recipes_count / Paginate.page_size))
+    return (
+        ('recipes_list', '/api/recipes/', False, False),
+        ('recipes_list_anonymous', '/api/recipes/', True, False),
+        ('recipes_list_cursor', '/api/recipes/?pagination=cursor',
+         False, False),
+        ('recipes_list_deep_page', f'/api/recipes/?page={last_page}',
+         False, False),
+        ('recipe_detail', f'/api/recipes/{recipe_id}/', False, False),
+        ('filter_tags', '/api/recipes/?tags=breakfast&tags=dinner',
+         False, False),
+        ('filter_author', f'/api/recipes/?author={author_id}',
+         False, False),
+        ('filter_is_favorited', '/api/recipes/?is_favorited=1',
+         False, False),
+        ('filter_is_in_shopping_cart', '/api/recipes/?is_in_shopping_cart=1',
+         False, False),
+        ('subscriptions', '/api/users/subscriptions/?recipes_limit=3',
+         False, False),
+        ('ingredient_search', '/api/ingredients/?name=мук', False, True),
+        ('ingredient_search_contains', '/api/ingredients/?name=сыр',
+         False, True),
+        ('tags_list', '/api/tags/', False, True),
+        ('download_shopping_cart_pdf',
+         '/api/recipes/download_shopping_cart/?format=pdf', False, False),
+        ('download_shopping_cart_txt',
+         '/api/recipes/download_shopping_cart/?format=txt', False, False),
+        ('download_shopping_cart_csv',
+         '/api/recipes/download_shopping_cart/?format=csv', False, False),
+    )
+
+
+def fetch(client, url):
+    response = client.get(url)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response.status_code, size
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарк горячих путей API на синтетических данных во '
+            'временной тестовой базе (SQLite или локальный Postgres из '
+            'настроек). Для каждого сценария пишет в JSON время ответа, '
+            'число SQL-запросов и пик выделенной памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз повторять каждый запрос.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--only', nargs='*', default=(),
+                            help='Запустить только эти сценарии.')
+        parser.add_argument('--output', default='benchmark.json',
+                            help='Куда записать результаты ("-" — stdout).')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не пересоздавать тестовую базу.')
+
+    def measure(self, client, url, repeat, cold):
+        def prepare():
+            if cold:
+                cache.clear()
+
+        prepare()
+        status, size = fetch(client, url)  # прогрев
+        if status != 200:
+            # Замер ответа с ошибкой выдавал бы чужие цифры за результат
+            raise CommandError(f'{url} ответил {status}, а не 200')
+
+        prepare()
+        with CaptureQueriesContext(connection) as queries:
+            fetch(client, url)
+        # Следующий запрос очистит connection.queries (reset_queries)
+        query_count = len(queries)
+
+        prepare()
+        tracemalloc.start()
+        fetch(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            prepare()
+            started = time.perf_counter()
+            fetch(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return {
+            'url': url,
+            'status': status,
+            'bytes': size,
+            'queries': query_count,
+            'alloc_peak_kb': round(peak / 1024, 1),
+            'min_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+        }
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, keepdb=options['keepdb'])
+        old_config = runner.setup_databases()
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    report = self.run(options)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(content)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+            self.stderr.write(f'Результаты записаны в {options["output"]}')
+
+    def run(self, options):
+        started = time.perf_counter()
+        data = Seeder(
+            options['users'], options['recipes'], options['seed']
+        ).run()
+        seed_seconds = time.perf_counter() - started
+        cache.clear()
+
+        client, anonymous = APIClient(), APIClient()
+        client.force_authenticate(data.user)
+        results = {}
+        for name, url, is_anonymous, cold in scenarios(data):
+            if options['only'] and name not in options['only']:
+                continue
+            result = self.measure(
+                anonymous if is_anonymous else client, url,
+                options['repeat'], cold
+            )
+            results[name] = result
+            self.stderr.write(
+                f'{name:32} {result["median_ms"]:9.2f} ms '
+                f'{result["queries"]:4} q {result["alloc_peak_kb"]:9.1f} KiB'
+            )
+
+        return {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+                'argv': sys.argv[1:],
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+                'seed_seconds': round(seed_seconds, 2),
+                'rows': {
+                    model._meta.label: model.objects.count()
+                    for model in (CustomUser, Recipe, RecipeIngredient,
+                                  Favorite, ShoppingCart, Follow, Ingredient)
+                },
+            },
+            'results': results,
+        }
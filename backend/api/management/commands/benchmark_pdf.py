@@ -0,0 +1,34 @@
+from io import BytesIO
+from timeit import repeat
+
+from django.core.management.base import BaseCommand
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from api.pdf import FONT_NAME, FONT_PATH, PDFTemplate, get_template
+from api.shopping_list import TITLE
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость рендера списка покупок с регистрацией '
+            'шрифта на каждый запрос и с общим реестром шаблонов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=30)
+        parser.add_argument('--number', type=int, default=20)
+
+    def handle(self, *args, **options):
+        lines = [f'Ингредиент {i} - {i} г' for i in range(options['lines'])]
+        number = options['number']
+
+        def per_request():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
+            PDFTemplate(TITLE).render(lines, BytesIO())
+
+        def registry():
+            get_template(TITLE).render(lines, BytesIO())
+
+        for name, func in (('per-request', per_request),
+                           ('registry', registry)):
+            best = min(repeat(func, number=number, repeat=3)) / number
+            self.stdout.write(f'{name}: {best * 1000:.2f} ms/render')
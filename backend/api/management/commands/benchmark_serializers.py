@@ -0,0 +1,88 @@
+from timeit import repeat
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.ingredient_index import ingredient_index
+from api.renderers import FastJSONRenderer
+from api.serializers import (IngredientSerializer, RecipeListSerializer,
+                             RecipeSerializer, TagListSerializer,
+                             TagSerializer)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает списки рецептов, тегов и ингредиентов: '
+            'RecipeSerializer/TagSerializer/IngredientSerializer с '
+            'JSONRenderer против ручных сериализаторов с FastJSONRenderer. '
+            'Ответы должны совпадать побайтно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--number', type=int, default=20)
+        parser.add_argument('--user', type=int,
+                            help='id пользователя, от имени которого '
+                                 'строится ответ (по умолчанию аноним).')
+
+    def make_context(self, user_id):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        if user_id is not None:
+            request.user = CustomUser.objects.get(pk=user_id)
+        return {'request': request, 'view': SimpleNamespace(action='list')}
+
+    def compare(self, name, slow, fast, number):
+        slow_content, fast_content = slow(), fast()
+        if slow_content != fast_content:
+            raise CommandError(f'{name}: ответы различаются')
+        self.stdout.write(f'{name}: {len(fast_content)} байт, совпадают')
+        for label, func in (('DRF', slow), ('fast', fast)):
+            best = min(repeat(func, number=number, repeat=3)) / number
+            self.stdout.write(f'  {label}: {best * 1000:.2f} ms/response')
+
+    def handle(self, *args, **options):
+        recipes = list(Recipe.objects.with_related()[:options['recipes']])
+        if not recipes:
+            raise CommandError('В базе нет рецептов для сравнения')
+        tags = list(Tag.objects.all())
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.lower(), ingredient.id)
+        )
+        context = self.make_context(options['user'])
+        number = options['number']
+        json_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+
+        self.compare(
+            'recipes',
+            lambda: json_renderer.render(RecipeSerializer(
+                recipes, many=True, context=context
+            ).data),
+            lambda: fast_renderer.render(RecipeListSerializer(
+                recipes, many=True, context=context
+            ).data),
+            number
+        )
+        self.compare(
+            'tags',
+            lambda: json_renderer.render(
+                TagSerializer(tags, many=True).data
+            ),
+            lambda: fast_renderer.render(
+                TagListSerializer(tags, many=True).data
+            ),
+            number
+        )
+        # Список ингредиентов отдаётся готовыми словарями из индекса
+        ingredient_index.invalidate()
+        self.compare(
+            'ingredients',
+            lambda: json_renderer.render(
+                IngredientSerializer(ingredients, many=True).data
+            ),
+            lambda: fast_renderer.render(ingredient_index.search('', None)),
+            number
+        )
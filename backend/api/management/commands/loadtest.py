@@ -0,0 +1,120 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import cycle
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?tags=breakfast&tags=lunch',
+    '/api/tags/',
+    '/api/ingredients/?name=мук',
+    '/api/users/subscriptions/?recipes_limit=3',
+)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного бэкенда: несколько потоков по '
+            'кругу запрашивают пути API в течение --duration секунд. '
+            'Запустите его против WSGI (gunicorn) и ASGI (gunicorn + '
+            'uvicorn worker) с одинаковым числом воркеров и сравните '
+            'результаты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Путь API, можно указать несколько раз.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--token',
+                            help='Токен для заголовка Authorization.')
+        parser.add_argument('--label', default='',
+                            help='Подпись прогона, например wsgi или asgi.')
+        parser.add_argument('--output', default='-',
+                            help='Файл для JSON-результатов ("-" — stdout).')
+
+    def handle(self, *args, **options):
+        base_url = options['url'].rstrip('/')
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        local = threading.local()
+        lock = threading.Lock()
+        urls = cycle(f'{base_url}{path}' for path in paths)
+        results = {path: [] for path in paths}
+        errors = {}
+        deadline = time.monotonic() + options['duration']
+
+        def worker(_):
+            local.session = requests.Session()
+            local.session.headers.update(headers)
+            while time.monotonic() < deadline:
+                with lock:
+                    url = next(urls)
+                path = url[len(base_url):]
+                started = time.perf_counter()
+                try:
+                    response = local.session.get(url, timeout=30)
+                    status = response.status_code
+                except requests.RequestException as error:
+                    status = type(error).__name__
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    if status == 200:
+                        results[path].append(elapsed)
+                    else:
+                        errors[f'{path} {status}'] = errors.get(
+                            f'{path} {status}', 0
+                        ) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(worker, range(options['concurrency'])))
+        wall = time.perf_counter() - started
+
+        total = sum(len(timings) for timings in results.values())
+        if not total:
+            raise CommandError(f'Ни одного успешного ответа: {errors}')
+        every = [value for timings in results.values() for value in timings]
+        report = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'label': options['label'],
+                'url': base_url,
+                'concurrency': options['concurrency'],
+                'duration_s': round(wall, 2),
+            },
+            'total': {
+                'requests': total,
+                'rps': round(total / wall, 1),
+                'median_ms': round(statistics.median(every), 2),
+                'p95_ms': round(percentile(every, 0.95), 2),
+                'p99_ms': round(percentile(every, 0.99), 2),
+            },
+            'paths': {
+                path: {
+                    'requests': len(timings),
+                    'median_ms': round(statistics.median(timings), 2),
+                    'p95_ms': round(percentile(timings, 0.95), 2),
+                }
+                for path, timings in results.items() if timings
+            },
+            'errors': errors,
+        }
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(content)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
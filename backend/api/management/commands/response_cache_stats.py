@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import RECIPES, get_response_stats, reset_response_stats
+
+
+class Command(BaseCommand):
+    help = ('Показывает статистику кеша ответов рецептов для анонимов: '
+            'долю попаданий, среднее время ответа и объём записей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счётчики после вывода.')
+
+    def handle(self, *args, **options):
+        stats = get_response_stats(RECIPES)
+        hits, misses = stats['hits'], stats['misses']
+        total = hits + misses
+        self.stdout.write(
+            f'Запросов: {total}, попаданий: {hits}, промахов: {misses}'
+        )
+        if total:
+            self.stdout.write(f'Доля попаданий: {hits / total:.1%}')
+        if hits:
+            self.stdout.write(
+                f'Среднее время попадания: {stats["hit_us"] / hits:.0f} мкс'
+            )
+        if misses:
+            self.stdout.write(
+                f'Среднее время промаха: {stats["miss_us"] / misses:.0f} мкс'
+            )
+            self.stdout.write(
+                f'Записано в кеш: {stats["bytes"]} байт, '
+                f'в среднем {stats["bytes"] / misses:.0f} на ответ'
+            )
+        if options['reset']:
+            reset_response_stats(RECIPES)
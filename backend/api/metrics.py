@@ -0,0 +1,247 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from api_foodgram.settings import METRICS_DIR, METRICS_FLUSH_INTERVAL
+
+DEFAULT_BUCKETS = (
+    .005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 7.5, 10
+)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, registry, name, documentation):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, tuple(sorted(labels.items())), amount)
+
+
+class Histogram:
+    def __init__(self, registry, name, documentation,
+                 buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self.registry.observe(
+            self.name, tuple(sorted(labels.items())),
+            bisect_left(self.buckets, value), value
+        )
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    """Метрики процесса в памяти с периодическим сбросом в файл.
+
+    Каждый воркер gunicorn пишет свои накопленные значения в
+    METRICS_DIR/<pid>.json не чаще раза в METRICS_FLUSH_INTERVAL секунд,
+    а /metrics складывает файлы всех воркеров, включая завершившиеся.
+    Без METRICS_DIR метрики видны только в своём процессе.
+    """
+
+    def __init__(self, directory=METRICS_DIR,
+                 flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+        if self.directory is not None:
+            atexit.register(self.flush)
+
+    def counter(self, name, documentation):
+        return self.metrics.setdefault(
+            name, Counter(self, name, documentation)
+        )
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self.metrics.setdefault(
+            name, Histogram(self, name, documentation, buckets)
+        )
+
+    def add(self, name, labels, amount):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, bucket, value):
+        with self._lock:
+            key = (name, labels)
+            state = self._histograms.get(key)
+            if state is None:
+                size = len(self.metrics[name].buckets) + 1
+                state = self._histograms[key] = [[0] * size, 0.0, 0]
+            state[0][bucket] += 1
+            state[1] += value
+            state[2] += 1
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'histograms': [
+                    [name, labels, list(counts), total, count]
+                    for (name, labels), (counts, total, count)
+                    in self._histograms.items()
+                ],
+            }
+
+    def _path(self):
+        return self.directory / f'{os.getpid()}.json'
+
+    def _maybe_flush(self):
+        if (self.directory is not None
+                and time.monotonic() - self._flushed_at
+                >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.directory is None:
+            return
+        self._flushed_at = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path()
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        # Читатели видят либо старый, либо новый файл целиком
+        os.replace(tmp_path, path)
+
+    def _snapshots(self):
+        yield self.snapshot()
+        if self.directory is None or not self.directory.exists():
+            return
+        own = self._path()
+        for path in self.directory.glob('*.json'):
+            if path == own:
+                continue
+            try:
+                yield json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+    def collect(self):
+        """Значения всех процессов, сложенные по имени и меткам."""
+        counters, histograms = {}, {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total, count in (
+                snapshot['histograms']
+            ):
+                key = (name, tuple(map(tuple, labels)))
+                state = histograms.setdefault(
+                    key, [[0] * len(counts), 0.0, 0]
+                )
+                for index, bucket_count in enumerate(counts):
+                    state[0][index] += bucket_count
+                state[1] += total
+                state[2] += count
+        return counters, histograms
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            kind = 'counter' if isinstance(metric, Counter) else 'histogram'
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric_name, labels), value in sorted(counters.items()):
+                    if metric_name == name:
+                        lines.append(
+                            f'{name}{_format_labels(labels)} '
+                            f'{_format_value(value)}'
+                        )
+                continue
+            for (metric_name, labels), (counts, total, count) in sorted(
+                histograms.items()
+            ):
+                if metric_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    (*metric.buckets, float('inf')), counts
+                ):
+                    cumulative += bucket_count
+                    le = (('le', _format_value(bound)),)
+                    lines.append(
+                        f'{name}_bucket{_format_labels(labels, le)} '
+                        f'{cumulative}'
+                    )
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса по view и action.'
+)
+DB_QUERIES = registry.counter(
+    'foodgram_db_queries_total', 'Число SQL-запросов по view и action.'
+)
+DB_QUERY_SECONDS = registry.counter(
+    'foodgram_db_query_seconds_total',
+    'Суммарное время SQL-запросов по view и action.'
+)
+CACHE_REQUESTS = registry.counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кешам приложения: result="hit" или "miss".'
+)
+RECIPE_UPDATE_ROWS = registry.counter(
+    'foodgram_recipe_update_rows_total',
+    'Строки, изменённые при обновлении рецептов: table="recipe", '
+    '"ingredients" или "tags".'
+)
+PDF_RENDER_SECONDS = registry.histogram(
+    'foodgram_pdf_render_seconds', 'Время рендера PDF списка покупок.',
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from api.metrics import DB_QUERIES, DB_QUERY_SECONDS, REQUEST_DURATION
+from api.profiling import (QueryCounter, RequestProfile, current_profile,
+                           current_query_counter)
+from api_foodgram.settings import (METRICS_ENABLED,
+                                   REQUEST_PROFILING_SAMPLE_RATE,
+                                   SLOW_QUERY_FINGERPRINTS, SLOW_REQUEST_MS)
+
+logger = logging.getLogger('api.profiling')
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class HybridMiddleware:
+    """Основа для middleware, которые работают и под WSGI, и под ASGI.
+
+    Синхронный middleware в async-цепочке Django выполняется в отдельном
+    потоке вместе со всем, что ниже него, и запросы идут по одному.
+    Наследники переопределяют before(), reset() и after(), вызов
+    get_response остаётся синхронным или асинхронным в зависимости от
+    цепочки. Сама основа ничего не замеряет и пропускает запрос.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 узнаёт async-middleware (как в MiddlewareMixin)
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.before(request)
+        if state is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.reset(state)
+        self.after(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        if state is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.reset(state)
+        self.after(request, response, state)
+        return response
+
+    def before(self, request):
+        """Состояние замера или None, если запрос не замеряется."""
+
+    def reset(self, state):
+        """Вызывается после get_response, даже если он упал."""
+
+    def after(self, request, response, state):
+        """Вызывается с ответом, если before() вернул состояние."""
+
+
+class RequestProfilingMiddleware(HybridMiddleware):
+    """Число и время SQL-запросов, дубли, время view, сериализации и
+    рендера для доли REQUEST_PROFILING_SAMPLE_RATE запросов.
+
+    Итог отдаётся в заголовке Server-Timing и пишется в лог api.profiling
+    одной JSON-строкой. Запросы дольше SLOW_REQUEST_MS логируются как
+    предупреждение вместе с самыми дорогими отпечатками SQL. При нулевой
+    доле middleware отключается целиком (MiddlewareNotUsed).
+    Запросы, которые потоковый ответ делает во время отдачи, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if REQUEST_PROFILING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def before(self, request):
+        if random.random() >= REQUEST_PROFILING_SAMPLE_RATE:
+            return None
+        profile = RequestProfile()
+        return profile, current_profile.set(profile)
+
+    def reset(self, state):
+        current_profile.reset(state[1])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.view_started = profile.elapsed
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся уже после выхода из view
+        profile = current_profile.get()
+        if profile is not None:
+            view_finished = profile.elapsed
+            profile.spans['view'] = view_finished - profile.view_started
+
+            def rendered(response):
+                profile.spans['render'] += profile.elapsed - view_finished
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def after(self, request, response, state):
+        profile = state[0]
+        total = profile.elapsed
+        sql_time = profile.sql_time
+        duplicates = profile.duplicates
+        view = profile.spans.get('view')
+        if view is None and profile.view_started is not None:
+            # Не DRF-ответ: view закончилась вместе с get_response
+            view = total - profile.view_started
+        timings = {
+            'db': sql_time,
+            'view': view or 0,
+            'serialize': profile.spans.get('serialize', 0),
+            'render': profile.spans.get('render', 0),
+            'total': total,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={_ms(duration)}'
+            + (f';desc="{len(profile.queries)} queries, '
+               f'{duplicates} duplicates"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(profile.queries),
+            'duplicates': duplicates,
+            **{f'{name}_ms': _ms(value) for name, value in timings.items()},
+        }
+        if total * 1000 >= SLOW_REQUEST_MS:
+            record['slow_queries'] = profile.slow_fingerprints(
+                SLOW_QUERY_FINGERPRINTS
+            )
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def view_name(view_func, method):
+    """RecipesViewSet.list, RecipesViewSet.favorite и т.п. для DRF,
+    модуль и имя функции для остальных view."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Гистограмма времени ответа и счётчики SQL по view и action.
+
+    Запросы, которые не дошли до view (404 роутинга, редиректы),
+    учитываются с view="unresolved".
+    """
+
+    def __init__(self, get_response):
+        if not METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def before(self, request):
+        counter = QueryCounter()
+        return counter, current_query_counter.set(counter), time.perf_counter()
+
+    def reset(self, state):
+        current_query_counter.reset(state[1])
+
+    def after(self, request, response, state):
+        counter, _, started = state
+        match = request.resolver_match
+        view = (view_name(match.func, request.method) if match
+                else 'unresolved')
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            view=view, method=request.method, status=response.status_code
+        )
+        if counter.count:
+            DB_QUERIES.inc(counter.count, view=view)
+            DB_QUERY_SECONDS.inc(counter.seconds, view=view)
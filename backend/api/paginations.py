@@ -1,6 +1,167 @@
-from rest_framework.pagination import PageNumberPagination
+import heapq
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Границы bigint: большее значение id база не примет
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_cursor_datetime(value):
+    value = parse_datetime(value)
+    if value is None or is_naive(value):
+        raise ValueError('Нужна дата со смещением от UTC')
+    return value
+
+
+def parse_cursor_id(value):
+    if (isinstance(value, bool) or not isinstance(value, int)
+            or not 0 <= value <= MAX_ID):
+        raise ValueError('Нужен целый id')
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по убыванию полей ordering без OFFSET и COUNT.
+
+    Курсор хранит значения полей последнего объекта страницы, следующая
+    страница выбирается условием (a, b) < (a0, b0) по индексу.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    # Разбор значений курсора по полям ordering, остальные поля — id
+    cursor_parsers = {'pub_date': parse_cursor_datetime}
+
+    def __init__(self, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+    def encode_cursor(self, values):
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+        return b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode()))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                self.cursor_parsers.get(field, parse_cursor_id)(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, values, fields=None):
+        keyset_filter = Q()
+        equal = {}
+        for field, value in zip(fields or self.ordering, values):
+            keyset_filter |= Q(**equal, **{f'{field}__lt': value})
+            equal[field] = value
+        return keyset_filter
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by(
+            *(f'-{field}' for field in self.ordering)
+        )
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        if self.has_next:
+            self.next_values = [
+                getattr(page[-1], field) for field in self.ordering
+            ]
+        return page
+
+    def paginate_sources(self, sources, request):
+        """Страница слияния нескольких запросов, упорядоченных так же.
+
+        sources — пары (queryset, поля queryset на месте полей ordering);
+        источники не должны пересекаться. Каждый читается по своему
+        индексу не больше чем на страницу, возвращаются кортежи значений
+        ordering.
+        """
+        self.request = request
+        values = self.decode_cursor(request)
+        pages = []
+        for queryset, fields in sources:
+            queryset = queryset.order_by(*(f'-{field}' for field in fields))
+            if values is not None:
+                queryset = queryset.filter(
+                    self.get_keyset_filter(values, fields)
+                )
+            pages.append(queryset.values_list(*fields)[:self.page_size + 1])
+        page = list(islice(
+            heapq.merge(*pages, reverse=True), self.page_size + 1
+        ))
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        if self.has_next:
+            self.next_values = list(page[-1])
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_values)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
 
 
 class Paginate(PageNumberPagination):
+    """Постраничная пагинация, по ?pagination=cursor — курсорная.
+
+    Курсорный режим доступен во view с атрибутом keyset_ordering.
+    """
     page_size = 6
     page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if (ordering
+                and request.query_params.get(self.mode_query_param)
+                == 'cursor'):
+            self.keyset = KeysetPagination(
+                ordering, self.get_page_size(request)
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
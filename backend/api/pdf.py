@@ -0,0 +1,86 @@
+import os
+import time
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api_foodgram.settings import (BASE_DIR, FONT_SIZE, X_CORD_TEXT,
+                                   X_CORD_TITLE, Y_CORD_BOTTOM, Y_CORD_TEXT,
+                                   Y_CORD_TITLE, Y_REMOVAL)
+
+# Шрифт с поддержкой русского языка
+FONT_NAME = '94-font'
+FONT_PATH = BASE_DIR / 'fonts' / '94-font.ttf'
+
+
+def register_fonts():
+    """Разбирает TTF-файл и регистрирует шрифт один раз на процесс."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
+
+
+class PDFTemplate:
+    """Разметка документа: шрифт, заголовок и строки с переносом страниц."""
+
+    def __init__(self, title, font_name=FONT_NAME, font_size=FONT_SIZE):
+        self.title = title
+        self.font_name = font_name
+        self.font_size = font_size
+
+    def _draw_header(self, pdf_create):
+        # Заголовок рисуется в форму один раз на документ,
+        # на каждой странице остаётся только ссылка на неё.
+        pdf_create.beginForm('header')
+        pdf_create.setFont(self.font_name, self.font_size)
+        pdf_create.drawString(X_CORD_TITLE, Y_CORD_TITLE, self.title)
+        pdf_create.endForm()
+
+    def _start_page(self, pdf_create):
+        pdf_create.doForm('header')
+        pdf_create.setFont(self.font_name, self.font_size)
+        return Y_CORD_TEXT
+
+    def render(self, lines, pdf_file):
+        """Рисует строки в pdf_file, добавляя страницы по мере заполнения."""
+        pdf_create = canvas.Canvas(
+            pdf_file,
+            initialFontName=self.font_name,
+            initialFontSize=self.font_size,
+        )
+        self._draw_header(pdf_create)
+        y_cord = self._start_page(pdf_create)
+        for line in lines:
+            if y_cord < Y_CORD_BOTTOM:
+                pdf_create.showPage()
+                y_cord = self._start_page(pdf_create)
+            pdf_create.drawString(X_CORD_TEXT, y_cord, line)
+            y_cord -= Y_REMOVAL
+        pdf_create.showPage()
+        pdf_create.save()
+
+
+@lru_cache(maxsize=None)
+def get_template(title):
+    """Возвращает закешированный шаблон документа с данным заголовком."""
+    register_fonts()
+    return PDFTemplate(title)
+
+
+def render_to_file(title, lines, path):
+    """Рендерит документ в path и возвращает время рендера в секундах.
+
+    Выполняется в процессе пула рендера: файл пишется рядом и заменяется
+    целиком, чтобы другие воркеры не прочитали его наполовину.
+    """
+    started = time.perf_counter()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as pdf_file:
+            get_template(title).render(lines, pdf_file)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return time.perf_counter() - started
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.utils.module_loading import import_string
+
+from api.metrics import CACHE_REQUESTS, PDF_RENDER_SECONDS
+from api.pdf import render_to_file
+from api_foodgram.settings import (PDF_INLINE_TIMEOUT, PDF_PENDING_TIMEOUT,
+                                   PDF_RENDER_QUEUE, PDF_RENDER_WORKERS,
+                                   PDF_RESULT_TTL, PDF_RESULTS_DIR)
+
+logger = logging.getLogger(__name__)
+
+# Меняется вместе с разметкой документа, чтобы не отдавать старые файлы
+RENDER_VERSION = '1'
+# Процессы рендера порождает чистый forkserver, а не fork воркера: fork
+# многопоточного процесса (пулы чтения, картинок, метрик) может унести в
+# потомка чужие захваченные блокировки. В forkserver заранее загружается
+# только api.pdf — ReportLab и настройки разметки, без Django.
+START_METHOD = 'forkserver'
+PRELOAD = ['api.pdf']
+
+
+class ProcessPoolQueue:
+    """Рендер в пуле процессов: ReportLab держит GIL, и в потоках
+    рендер занимал бы воркер целиком.
+
+    Пул создаётся при первой задаче, то есть уже в воркере gunicorn,
+    а не в мастер-процессе. Процессы пула стартуют через START_METHOD.
+    Если процесс пула погиб (например, его убил OOM killer), пул
+    перестаёт принимать задачи и пересоздаётся при следующей.
+    """
+
+    def __init__(self, max_workers=PDF_RENDER_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self):
+        context = multiprocessing.get_context(START_METHOD)
+        context.set_forkserver_preload(PRELOAD)
+        return ProcessPoolExecutor(self.max_workers, mp_context=context)
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self.executor is None:
+                self.executor = self._create_executor()
+            try:
+                return self.executor.submit(func, *args)
+            except BrokenProcessPool:
+                logger.warning('Пул рендера PDF сломан, создаётся заново')
+                self.executor.shutdown(wait=False)
+                self.executor = self._create_executor()
+                return self.executor.submit(func, *args)
+
+
+class ImmediateQueue:
+    """Рендер сразу в вызывающем потоке, для разработки и тестов."""
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class ResultStore:
+    """Готовые PDF в локальном каталоге, общем для воркеров.
+
+    Рядом с рендерящимся файлом лежит метка <digest>.pending: по ней
+    воркер, куда пришёл опрос или такая же корзина, понимает, что рендер
+    уже идёт. Метка старше PDF_PENDING_TIMEOUT считается брошенной.
+    """
+
+    def __init__(self, directory=PDF_RESULTS_DIR, ttl=PDF_RESULT_TTL,
+                 pending_timeout=PDF_PENDING_TIMEOUT):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+
+    def path(self, digest):
+        return self.directory / f'{digest}.pdf'
+
+    def _marker(self, digest):
+        return self.directory / f'{digest}.pending'
+
+    @staticmethod
+    def _age(path):
+        try:
+            return time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def get(self, digest):
+        path = self.path(digest)
+        return path if path.exists() else None
+
+    def is_pending(self, digest):
+        age = self._age(self._marker(digest))
+        return age is not None and age < self.pending_timeout
+
+    def claim(self, digest):
+        """Ставит метку рендера; False, если рендер уже идёт в другом
+        воркере."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        marker = self._marker(digest)
+        if self._age(marker) is not None and not self.is_pending(digest):
+            self.release(digest)
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return False
+        return True
+
+    def release(self, digest):
+        try:
+            self._marker(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self):
+        for path in self.directory.glob('*.pdf'):
+            age = self._age(path)
+            if age is not None and age > self.ttl:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+render_queue = import_string(PDF_RENDER_QUEUE)()
+result_store = ResultStore()
+# Рендеры этого процесса: повторный запрос ждёт ту же задачу
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def cart_digest(title, lines):
+    """Ключ готового файла: одинаковые корзины дают один и тот же PDF."""
+    payload = json.dumps(
+        [RENDER_VERSION, title, lines], ensure_ascii=False
+    ).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _finished(digest, future):
+    with _in_flight_lock:
+        _in_flight.pop(digest, None)
+    result_store.release(digest)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error('Рендер PDF %s упал: %r', digest, error)
+    else:
+        PDF_RENDER_SECONDS.observe(future.result())
+
+
+def _submit(digest, title, lines):
+    with _in_flight_lock:
+        future = _in_flight.get(digest)
+        if future is not None:
+            return future
+        if not result_store.claim(digest):
+            return None
+        try:
+            future = render_queue.submit(
+                render_to_file, title, lines, str(result_store.path(digest))
+            )
+        except Exception:
+            # Иначе метка держала бы эту корзину в 202 до
+            # PDF_PENDING_TIMEOUT во всех воркерах
+            result_store.release(digest)
+            raise
+        _in_flight[digest] = future
+    future.add_done_callback(lambda done: _finished(digest, done))
+    result_store.cleanup()
+    return future
+
+
+def render(title, lines, timeout=PDF_INLINE_TIMEOUT):
+    """Возвращает (digest, путь к PDF или None, если рендер не успел
+    за timeout секунд и результат надо забирать по digest)."""
+    digest = cart_digest(title, lines)
+    path = result_store.get(digest)
+    if path is not None:
+        CACHE_REQUESTS.inc(cache='shopping-pdf', result='hit')
+        return digest, path
+    CACHE_REQUESTS.inc(cache='shopping-pdf', result='miss')
+    future = _submit(digest, title, lines)
+    if future is None:
+        return digest, None
+    try:
+        future.result(timeout)
+    except FutureTimeoutError:
+        return digest, None
+    return digest, result_store.path(digest)
+
+
+def status(digest):
+    """'ready' с путём к файлу, 'pending' или 'missing'."""
+    path = result_store.get(digest)
+    if path is not None:
+        return 'ready', path
+    with _in_flight_lock:
+        running = digest in _in_flight
+    if running or result_store.is_pending(digest):
+        return 'pending', None
+    return 'missing', None
@@ -0,0 +1,137 @@
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# ContextVar, а не атрибут соединения: sync_to_async переносит контекст
+# в поток, где view ходит в БД, так что запросы видны и на ASGI.
+current_profile = ContextVar('current_profile', default=None)
+current_query_counter = ContextVar('current_query_counter', default=None)
+
+_FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными id совпадают."""
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def instrumented_execute(execute, sql, params, many, context):
+    """execute_wrapper каждого соединения: отдаёт время запроса счётчику
+    и профилю текущего HTTP-запроса, если они есть."""
+    observers = [
+        observer
+        for observer in (current_query_counter.get(), current_profile.get())
+        if observer is not None
+    ]
+    if not observers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for observer in observers:
+            observer.record(sql, params, duration)
+
+
+def install_instrumentation(connection, **kwargs):
+    if instrumented_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, instrumented_execute)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def record(self, sql, params, duration):
+        self.count += 1
+        self.seconds += duration
+
+
+class RequestProfile:
+    """Запросы к БД и время участков одного HTTP-запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.spans = defaultdict(float)
+        self.view_started = None
+        self._depth = Counter()
+
+    def record(self, sql, params, duration):
+        self.queries.append((sql, repr(params), duration))
+
+    @contextmanager
+    def span(self, name):
+        # Вложенные участки с тем же именем не считаются дважды
+        self._depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] -= 1
+            if not self._depth[name]:
+                self.spans[name] += time.perf_counter() - started
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def sql_time(self):
+        return sum(duration for *_, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторяют уже выполненный с теми же параметрами."""
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+    def slow_fingerprints(self, limit):
+        """Самые дорогие группы запросов: отпечаток, число и время (мс)."""
+        groups = defaultdict(lambda: [0, 0.0])
+        for sql, _, duration in self.queries:
+            group = groups[fingerprint(sql)]
+            group[0] += 1
+            group[1] += duration
+        return [
+            {
+                'fingerprint': sql,
+                'count': count,
+                'ms': round(duration * 1000, 2),
+            }
+            for sql, (count, duration) in sorted(
+                groups.items(), key=lambda item: item[1][1], reverse=True
+            )[:limit]
+        ]
+
+
+def profiled(to_representation):
+    """Учитывает to_representation в участке serialize профиля запроса."""
+    @wraps(to_representation)
+    def wrapper(self, instance):
+        profile = current_profile.get()
+        if profile is None:
+            return to_representation(self, instance)
+        with profile.span('serialize'):
+            return to_representation(self, instance)
+    return wrapper
+
+
+class ProfiledSerializerMixin:
+    """Для сериализаторов, которые сами не переопределяют to_representation."""
+    @profiled
+    def to_representation(self, instance):
+        return super().to_representation(instance)
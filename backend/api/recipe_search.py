@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from api_foodgram.settings import (RECIPE_SEARCH_FALLBACK_LIMIT,
+                                   RECIPE_SEARCH_INDEX_TTL)
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+# Веса ts_rank по умолчанию для A (название), B (ингредиенты), C (текст)
+NAME_WEIGHT, INGREDIENT_WEIGHT, TEXT_WEIGHT = 1.0, 0.4, 0.2
+
+_WORD = re.compile(r'\w+')
+# Служебные слова, которые словарь russian тоже отбрасывает
+STOP_WORDS = frozenset((
+    'а', 'без', 'в', 'во', 'да', 'для', 'до', 'за', 'и', 'из', 'или',
+    'к', 'ко', 'на', 'над', 'не', 'ни', 'о', 'об', 'от', 'по', 'под',
+    'при', 'с', 'со', 'у',
+))
+# Окончания по убыванию длины: грубое приближение русского стеммера
+# Snowball, которым пользуется конфигурация russian в PostgreSQL
+_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'иях', 'ях', 'ах', 'иям', 'ям', 'ам',
+    'ием', 'ем', 'ом', 'ией', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя',
+    'ое', 'ее', 'ые', 'ие', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ых', 'их', 'ую', 'юю', 'ов', 'ев', 'ия', 'ья', 'ию', 'ью',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [
+        stem(word) for word in _WORD.findall((text or '').lower())
+        if word not in STOP_WORDS
+    ]
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов в памяти процесса.
+
+    Замена полнотекстовому поиску PostgreSQL для SQLite и локальной
+    разработки. Как и индекс ингредиентов, строится при первом запросе,
+    сбрасывается сигналами и перестраивается раз в RECIPE_SEARCH_INDEX_TTL
+    секунд, чтобы подхватить изменения из других процессов.
+    """
+
+    def __init__(self, ttl=RECIPE_SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._snapshot = None
+
+    def invalidate(self):
+        self._generation += 1
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot['generation'] == self._generation
+            and time.monotonic() - snapshot['built_at'] < self.ttl
+        )
+
+    def _build(self):
+        generation = self._generation
+        postings = defaultdict(lambda: defaultdict(float))
+
+        def add(recipe_id, text, weight):
+            for token in tokenize(text):
+                postings[token][recipe_id] += weight
+
+        for recipe_id, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).iterator():
+            add(recipe_id, name, NAME_WEIGHT)
+            add(recipe_id, text, TEXT_WEIGHT)
+        for recipe_id, name in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            add(recipe_id, name, INGREDIENT_WEIGHT)
+        return {
+            'generation': generation,
+            'built_at': time.monotonic(),
+            'postings': {
+                token: dict(recipes) for token, recipes in postings.items()
+            },
+        }
+
+    def _get_snapshot(self):
+        if not self._is_fresh(self._snapshot):
+            with self._lock:
+                if not self._is_fresh(self._snapshot):
+                    self._snapshot = self._build()
+        return self._snapshot
+
+    def search(self, query, limit):
+        """[(id рецепта, ранг)] по убыванию ранга; как plainto_tsquery,
+        рецепт должен содержать все слова запроса."""
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        postings = self._get_snapshot()['postings']
+        matches = [postings.get(token, {}) for token in tokens]
+        matches.sort(key=len)
+        scores = {}
+        for recipe_id, score in matches[0].items():
+            for other in matches[1:]:
+                if recipe_id not in other:
+                    break
+                score += other[recipe_id]
+            else:
+                scores[recipe_id] = score
+        return sorted(
+            scores.items(), key=lambda item: (-item[1], -item[0])
+        )[:limit]
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """Рецепты queryset, подходящие под запрос, по убыванию ранга.
+
+    В PostgreSQL — GIN-индекс по колонке search_vector из миграции
+    recipes.0013 и ts_rank, в остальных базах — RecipeSearchIndex
+    (не больше RECIPE_SEARCH_FALLBACK_LIMIT лучших рецептов).
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        # Колонки нет в модели: её ведут триггеры, а не ORM
+        return queryset.alias(
+            search_vector=RawSQL(
+                'recipes_recipe.search_vector', [],
+                output_field=SearchVectorField()
+            )
+        ).filter(
+            search_vector=search_query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+
+    ranked = recipe_search_index.search(query, RECIPE_SEARCH_FALLBACK_LIMIT)
+    if not ranked:
+        return queryset.none()
+    return queryset.filter(
+        pk__in=[recipe_id for recipe_id, _ in ranked]
+    ).annotate(
+        rank=Case(
+            *(When(pk=recipe_id, then=Value(score))
+              for recipe_id, score in ranked),
+            output_field=FloatField()
+        )
+    ).order_by('-rank', '-pub_date', '-id')
@@ -1,18 +1,34 @@
 import base64
-
-from django.core.files.base import ContentFile
+import binascii
+from collections import defaultdict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from PIL import Image
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 
-from api_foodgram.settings import MAX_VALUE, MIN_VALUE
-from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+from api.cache import get_user_relations
+from api.metrics import RECIPE_UPDATE_ROWS
+from api.profiling import ProfiledSerializerMixin, profiled
+from api_foodgram.settings import (BASE64_CHUNK_SIZE, IMAGE_FORMATS,
+                                   MAX_IMAGE_SIDE, MAX_IMAGE_SIZE, MAX_VALUE,
+                                   MIN_VALUE)
+from recipes.images import thumbnail_url
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.signals import recipe_ingredients_changed
 from users.models import CustomUser
 
+BASE64_MARKER = ';base64,'
+
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(ProfiledSerializerMixin, UserSerializer):
     """Сериализатор для кастомного юзера."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -28,10 +44,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return user.follower.filter(author=obj).exists()
-        return False
+        return obj.id in get_user_relations(self.context['request']).following
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -48,14 +61,15 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для тегов."""
     class Meta:
         fields = ('id', 'name', 'color', 'slug')
         model = Tag
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
     class Meta:
         fields = ('id', 'name', 'measurement_unit')
@@ -64,15 +78,90 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class Base64ImageField(serializers.ImageField):
     """Отдельный сериализатор для картинок."""
+    def check_image(self, image_file):
+        """Проверяет заголовок файла и возвращает настоящий формат."""
+        # Image.open читает только заголовок, пиксели не декодируются
+        try:
+            with Image.open(image_file) as image:
+                image_format, size = image.format, image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError('Загрузите корректное изображение.')
+        finally:
+            image_file.seek(0)
+        if image_format not in IMAGE_FORMATS:
+            raise ValidationError(
+                f'Допустимые форматы: {", ".join(IMAGE_FORMATS)}.'
+            )
+        if max(size) > MAX_IMAGE_SIDE:
+            raise ValidationError(
+                f'Сторона изображения не больше {MAX_IMAGE_SIDE} пикселей.'
+            )
+        return image_format
+
+    def decode(self, data):
+        """Декодирует data URI по частям во временный файл.
+
+        Размер проверяется по длине строки до декодирования. Небольшие
+        картинки остаются в памяти, крупные пишутся на диск, как это
+        делают обработчики загрузки Django.
+        """
+        start = data.find(BASE64_MARKER)
+        if start == -1:
+            raise ValidationError('Загрузите корректное изображение.')
+        start += len(BASE64_MARKER)
+        size = (len(data) - start) // 4 * 3
+        if size > MAX_IMAGE_SIZE:
+            raise ValidationError(
+                f'Размер изображения не больше {MAX_IMAGE_SIZE} байт.'
+            )
+
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            image_file = TemporaryUploadedFile('temp', None, size, None)
+        else:
+            image_file = InMemoryUploadedFile(
+                BytesIO(), None, 'temp', None, size, None
+            )
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                image_file.write(base64.b64decode(
+                    data[offset:offset + BASE64_CHUNK_SIZE], validate=True
+                ))
+        except binascii.Error:
+            raise ValidationError('Загрузите корректное изображение.')
+        image_file.size = image_file.tell()
+        image_file.seek(0)
+
+        # Расширение берётся из заголовка файла, а не из data:image/<ext>
+        image_format = self.check_image(image_file)
+        image_file.name = f'temp.{image_format.lower()}'
+        image_file.content_type = Image.MIME[image_format]
+        return image_file
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(data)
+        elif hasattr(data, 'seek'):
+            self.check_image(data)
 
         return super().to_internal_value(data)
 
 
+class ThumbnailMixin:
+    """Отдаёт в image миниатюру нужного размера, если она уже готова."""
+    def get_thumbnail_size(self):
+        return None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        url = thumbnail_url(instance, self.get_thumbnail_size())
+        if url:
+            request = self.context.get('request')
+            data['image'] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return data
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор, который связывает модели рецепт и ингредиенты."""
     name = serializers.StringRelatedField(
@@ -91,7 +180,8 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('amount', 'name', 'measurement_unit', 'id')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin, ThumbnailMixin,
+                       serializers.ModelSerializer):
     """Сериализатор для рецептов."""
     tags = TagSerializer(read_only=True, many=True)
     author = CustomUserSerializer(read_only=True)
@@ -117,8 +207,11 @@ class RecipeSerializer(serializers.ModelSerializer):
             'image',
             'is_in_shopping_cart',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'favorites_count',
+            'shopping_cart_count'
         )
+        read_only_fields = ('favorites_count', 'shopping_cart_count')
 
     def validate_cooking_time(self, cooking_time):
         if cooking_time < MIN_VALUE or cooking_time > MAX_VALUE:
@@ -126,46 +219,102 @@ class RecipeSerializer(serializers.ModelSerializer):
                 'Укажите время приготовления в диапазоне от 1 до 3200!')
         return cooking_time
 
+    def get_thumbnail_size(self):
+        view = self.context.get('view')
+        if view is not None and view.action == 'list':
+            return 'medium'
+        return 'large'
+
+    @staticmethod
+    def _to_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _validate_ingredient_item(self, item, found, seen):
+        if not isinstance(item, dict):
+            return {'non_field_errors': [
+                'Ожидался объект с полями id и amount'
+            ]}
+        ingredient_id = self._to_int(item.get('id'))
+        amount = self._to_int(item.get('amount'))
+        errors = {}
+        if ingredient_id not in found:
+            errors['id'] = ['Ингредиент не найден']
+        elif ingredient_id in seen:
+            errors['id'] = ['Ингредиенты должны быть уникальными']
+        seen.add(ingredient_id)
+        if amount is None or not MIN_VALUE < amount < MAX_VALUE:
+            errors['amount'] = ['Введите значение в диапазоне от 1 до 3200!']
+        return errors
+
+    def _validate_tags(self, tags):
+        tag_ids = (
+            {self._to_int(tag) for tag in tags}
+            if isinstance(tags, list) else {None}
+        )
+        if None in tag_ids:
+            raise ValidationError({'tags': ['Ожидался список id тегов']})
+        missing = tag_ids - Tag.objects.in_bulk(tag_ids).keys()
+        if missing:
+            raise ValidationError({'tags': [
+                f'Теги не найдены: {", ".join(map(str, sorted(missing)))}'
+            ]})
+        return tag_ids
+
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
         if not ingredients:
             raise ValidationError(
                 'Нужен хотя бы один ингредиент для рецепта'
             )
-        ingredient_set = set()
-        for ingredient_item in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient, id=ingredient_item['id']
+        if not isinstance(ingredients, list):
+            raise ValidationError(
+                {'ingredients': ['Ожидался список ингредиентов']}
             )
-            if ingredient in ingredient_set:
-                raise ValidationError(
-                    'Ингредиенты должны быть уникальными'
-                )
-            ingredient_set.add(ingredient)
-            if not MIN_VALUE < int(ingredient_item['amount']) < MAX_VALUE:
-                raise ValidationError(
-                    'Введите значение в диапазоне от 1 до 3200!'
-                )
-        data['ingredients'] = ingredients
+        # Все ингредиенты загружаются одним запросом, ошибки собираются
+        # по каждому элементу в формате вложенного сериализатора DRF.
+        found = Ingredient.objects.in_bulk([
+            ingredient_id for ingredient_id in (
+                self._to_int(item.get('id')) for item in ingredients
+                if isinstance(item, dict)
+            ) if ingredient_id is not None
+        ])
+        seen = set()
+        errors = [
+            self._validate_ingredient_item(item, found, seen)
+            for item in ingredients
+        ]
+        if any(errors):
+            raise ValidationError({'ingredients': errors})
+        data['ingredients'] = [
+            {
+                'ingredient': found[self._to_int(item['id'])],
+                'amount': self._to_int(item['amount'])
+            }
+            for item in ingredients
+        ]
+        tags = self.initial_data.get('tags')
+        if tags is not None:
+            data['tags'] = self._validate_tags(tags)
+        elif self.instance is None:
+            raise ValidationError({'tags': ['Обязательное поле.']})
         return data
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.favorites.filter(user=user).exists()
-        return False
+        return obj.id in get_user_relations(self.context['request']).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.shopping_cart.filter(user=user).exists()
-        return False
+        return obj.id in get_user_relations(
+            self.context['request']
+        ).shopping_cart
 
     def create_ingredients(self, recipe, ingredients):
         create_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient['id'],
+                ingredient=ingredient['ingredient'],
                 amount=ingredient['amount']
             )
             for ingredient in ingredients
@@ -173,10 +322,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.bulk_create(
             create_ingredients
         )
+        recipe_ingredients_changed.send(
+            sender=RecipeIngredient, recipe_id=recipe.id
+        )
 
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
-        tags = self.initial_data.get('tags')
+        tags = validated_data.pop('tags')
 
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(recipe, ingredients)
@@ -184,47 +336,181 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
-    def update(self, instance, validated_data):
-        instance.tags.clear()
-        tags = self.initial_data.get('tags')
-        instance.tags.set(tags)
-
-        instance.image = validated_data.get('image', instance.image)
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time)
+    def update_tags(self, instance, tags):
+        """Добавляет и удаляет только изменившиеся теги (id уже проверены
+        в validate)."""
+        current = {tag.id for tag in instance.tags.all()}
+        instance.tags.remove(*(current - tags))
+        instance.tags.add(*(tags - current))
+        return len(current ^ tags)
+
+    def update_ingredients(self, instance, ingredients):
+        """Сравнивает ингредиенты рецепта с новыми и меняет только разницу."""
+        current, stale = {}, []
+        for recipe_ingredient in instance.recipeingredient_set.all():
+            if recipe_ingredient.ingredient_id in current:
+                stale.append(recipe_ingredient.id)
+            else:
+                current[recipe_ingredient.ingredient_id] = recipe_ingredient
+
+        new, changed = [], []
+        for item in ingredients:
+            recipe_ingredient = current.pop(item['ingredient'].id, None)
+            if recipe_ingredient is None:
+                new.append(item)
+            elif recipe_ingredient.amount != item['amount']:
+                recipe_ingredient.amount = item['amount']
+                changed.append(recipe_ingredient)
+        stale.extend(
+            recipe_ingredient.id for recipe_ingredient in current.values()
+        )
 
+        if stale:
+            RecipeIngredient.objects.filter(id__in=stale).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+            recipe_ingredients_changed.send(
+                sender=RecipeIngredient, recipe_id=instance.id
+            )
+        if new:
+            self.create_ingredients(instance, new)
+        return len(stale) + len(changed) + len(new)
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл декодированной картинки больше не нужен
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).all().delete()
-        self.create_ingredients(instance, ingredients)
-        instance.save()
+        tags = validated_data.pop('tags', None)
+        self.rows_touched = {
+            'tags': 0,
+            'ingredients': self.update_ingredients(instance, ingredients),
+            'recipe': 0,
+        }
+        if tags is not None:
+            self.rows_touched['tags'] = self.update_tags(instance, tags)
+
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            # Счётчики обновляются отдельно через F(), их не перезаписываем
+            instance.save(update_fields=changed_fields)
+            self.rows_touched['recipe'] = 1
+        transaction.on_commit(self._record_rows_touched)
         return instance
 
+    def _record_rows_touched(self):
+        for table, rows in self.rows_touched.items():
+            RECIPE_UPDATE_ROWS.inc(rows, table=table)
+
+
+def _image_url(request, recipe, size):
+    url = thumbnail_url(recipe, size)
+    if url is None:
+        if not recipe.image:
+            return None
+        url = recipe.image.url
+    return request.build_absolute_uri(url) if request else url
+
+
+def _tag_data(tag):
+    return {
+        'id': tag.id,
+        'name': tag.name,
+        'color': tag.color,
+        'slug': tag.slug,
+    }
+
+
+class TagListSerializer(serializers.BaseSerializer):
+    """Теги только для чтения, без полей DRF. Вывод как у TagSerializer."""
+    @profiled
+    def to_representation(self, tag):
+        return _tag_data(tag)
+
+
+class RecipeListSerializer(serializers.BaseSerializer):
+    """Список рецептов только для чтения, собранный вручную.
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+    Ответ побайтно совпадает с RecipeSerializer для action list
+    (проверяет команда benchmark_serializers), но не проходит через
+    поля DRF. Рецепты должны быть загружены через with_related().
+    """
+    thumbnail_size = 'medium'
+
+    @profiled
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        relations = get_user_relations(request)
+        author = recipe.author
+        return {
+            'id': recipe.id,
+            'tags': [_tag_data(tag) for tag in recipe.tags.all()],
+            'author': {
+                'id': author.id,
+                'username': author.username,
+                'email': author.email,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': author.id in relations.following,
+            },
+            'ingredients': [
+                {
+                    'amount': item.amount,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'id': item.ingredient_id,
+                }
+                for item in recipe.recipeingredient_set.all()
+            ],
+            'is_favorited': recipe.id in relations.favorites,
+            'name': recipe.name,
+            'image': _image_url(request, recipe, self.thumbnail_size),
+            'is_in_shopping_cart': recipe.id in relations.shopping_cart,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'favorites_count': recipe.favorites_count,
+            'shopping_cart_count': recipe.shopping_cart_count,
+        }
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """Загружает рецепты всех авторов страницы одним запросом."""
+    def to_representation(self, data):
+        authors = list(data)
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_author(
+            [author.id for author in authors], self.child.get_recipes_limit()
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        return super().to_representation(authors)
+
+
+class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор для подписки на автора."""
-    email = serializers.ReadOnlyField(source='author.email')
-    id = serializers.ReadOnlyField(source='author.id')
-    username = serializers.ReadOnlyField(source='author.username')
-    first_name = serializers.ReadOnlyField(source='author.first_name')
-    last_name = serializers.ReadOnlyField(source='author.last_name')
-    is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
-    class Meta:
-        model = Follow
-        fields = (
-            'id',
-            'username',
-            'email',
-            'first_name',
-            'last_name',
-            'is_subscribed',
+    class Meta(CustomUserSerializer.Meta):
+        fields = CustomUserSerializer.Meta.fields + (
             'recipes',
             'recipes_count'
         )
+        read_only_fields = fields
+        list_serializer_class = SubscriptionListSerializer
 
     def validate(self, data):
         author_id = self.context.get(
@@ -243,27 +529,26 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             )
         return data
 
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        author = obj.author
-        return user.follower.filter(author=author).exists()
+    def get_recipes_limit(self):
+        limit = self.context.get('request').GET.get('recipes_limit', '')
+        return int(limit) if limit.isdigit() else None
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = obj.author.recipes.all()
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj, 'latest_recipes'):
+            queryset = obj.latest_recipes
+        else:
+            queryset = obj.recipes.all()[:self.get_recipes_limit()]
         return RecipeMinifiedSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
-
 
-class RecipeMinifiedSerializer(serializers.ModelSerializer):
+class RecipeMinifiedSerializer(ProfiledSerializerMixin, ThumbnailMixin,
+                               serializers.ModelSerializer):
     """Сериализатор для избранных рецептов и списка покупок."""
     image = Base64ImageField()
 
+    def get_thumbnail_size(self):
+        return 'small'
+
     class Meta:
         model = Recipe
         fields = (
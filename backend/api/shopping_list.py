@@ -0,0 +1,64 @@
+import csv
+
+from django.db.models import Sum
+
+from api import pdf_jobs
+from recipes.models import RecipeIngredient
+
+TITLE = 'Список покупок'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+def get_shopping_list(user):
+    """Суммы ингредиентов из корзины, сгруппированные в базе данных."""
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).annotate(
+        total=Sum('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).iterator()
+
+
+def format_line(name, measurement_unit, amount):
+    return f'{name} - {amount} {measurement_unit}'
+
+
+def stream_txt(ingredients):
+    yield f'{TITLE}\n\n'.encode()
+    for ingredient in ingredients:
+        yield f'{format_line(*ingredient)}\n'.encode()
+
+
+class _Echo:
+    """Псевдобуфер: csv.writer пишет строку и сразу получает её обратно."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER).encode()
+    for ingredient in ingredients:
+        yield writer.writerow(ingredient).encode()
+
+
+def render_pdf(ingredients):
+    """PDF рендерится в пуле процессов и кешируется по содержимому
+    корзины: возвращает (digest, путь к файлу или None, пока он не готов).
+    """
+    return pdf_jobs.render(
+        TITLE, [format_line(*ingredient) for ingredient in ingredients]
+    )
+
+
+PDF_CONTENT_TYPE = 'application/pdf'
+EXPORTS = {
+    'txt': ('text/plain; charset=utf-8', stream_txt),
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+}
+DEFAULT_EXPORT = 'pdf'
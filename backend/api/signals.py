@@ -0,0 +1,82 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import (INGREDIENTS, RECIPES, TAGS, bump_version,
+                       invalidate_user_relations)
+from api.cookable_index import cookable_index
+from api.profiling import install_instrumentation
+from api.recipe_search import recipe_search_index
+from recipes.images import thumbnails_ready
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.signals import ingredients_loaded, recipe_ingredients_changed
+from users.models import CustomUser
+
+# Поля автора, которые попадают в ответы рецептов
+AUTHOR_FIELDS = frozenset(
+    ('username', 'email', 'first_name', 'last_name')
+)
+
+connection_created.connect(install_instrumentation)
+
+
+@receiver((post_save, post_delete, ingredients_loaded), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    # Индекс ингредиентов перестраивается по новой версии INGREDIENTS
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(lambda: bump_version(TAGS))
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver((post_save, post_delete, thumbnails_ready), sender=Recipe)
+@receiver((post_save, post_delete, recipe_ingredients_changed),
+          sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(**kwargs):
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_author(update_fields, **kwargs):
+    # Вход (last_login) и смена пароля автора в рецептах не видны
+    if update_fields is None or AUTHOR_FIELDS & update_fields:
+        transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete, recipe_ingredients_changed),
+          sender=RecipeIngredient)
+@receiver((post_save, post_delete, ingredients_loaded), sender=Ingredient)
+def invalidate_recipe_search(**kwargs):
+    transaction.on_commit(recipe_search_index.invalidate)
+
+
+@receiver((post_save, post_delete, recipe_ingredients_changed),
+          sender=RecipeIngredient)
+def update_cookable_index(**kwargs):
+    instance = kwargs.get('instance')
+    recipe_id = kwargs['recipe_id'] if instance is None else instance.recipe_id
+    transaction.on_commit(partial(cookable_index.update, recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_cookable_index(instance, **kwargs):
+    transaction.on_commit(partial(cookable_index.remove, instance.pk))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_relations(instance, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_user_relations(instance.user_id)
+    )
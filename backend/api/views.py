@@ -1,27 +1,41 @@
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import (FileResponse, Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from api.cache import (INGREDIENTS, RECIPES, TAGS, AnonymousResponseCacheMixin,
+                       CatalogCacheMixin)
+from api.cookable_index import cookable_index
 from api.filters import TagFilter
+from api.ingredient_index import ingredient_index
+from api.metrics import registry
+from api.paginations import KeysetPagination
 from api.permissions import (IsAdminOrReadOnlyPermission,
                              IsAuthorOrReadOnlyPermission)
+from api.renderers import (CSVRenderer, FastJSONRenderer, PDFRenderer,
+                           PlainTextRenderer, ShoppingListRenderer)
 from api.serializers import (CustomUserSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeSerializer,
-                             ShoppingCartSerializer, SubscriptionSerializer,
+                             IngredientSerializer, RecipeListSerializer,
+                             RecipeSerializer, ShoppingCartSerializer,
+                             SubscriptionSerializer, TagListSerializer,
                              TagSerializer)
-from api_foodgram.settings import (FONT_SIZE, X_CORD_TITLE, Y_CORD_TITLE,
-                                   Y_REMOVAL)
-from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+from api.pdf_jobs import status as pdf_status
+from api.recipe_search import search_recipes
+from api.shopping_list import (DEFAULT_EXPORT, EXPORTS, PDF_CONTENT_TYPE,
+                               get_shopping_list, render_pdf)
+from api_foodgram.settings import (CHUNK_SIZE, COOKABLE_MAX_MISSING,
+                                   INGREDIENT_SEARCH_LIMIT)
+from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
+                            Tag)
+from recipes.timeline import feed_sources
 from users.models import CustomUser
 
 
@@ -29,13 +43,19 @@ class CustomUserViewSet(UserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    keyset_ordering = None
 
     @action(methods=('get',), detail=False,
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            keyset_ordering=('follow_id',))
     def subscriptions(self, request):
-        user = request.user
-        follow = Follow.objects.filter(user=user)
-        page = self.paginate_queryset(follow)
+        authors = CustomUser.objects.filter(
+            author__user=request.user
+        ).annotate(
+            # id строки Follow: порядок подписок и ключ курсора
+            follow_id=F('author__id')
+        ).order_by('-follow_id')
+        page = self.paginate_queryset(authors)
         serializer = SubscriptionSerializer(page, many=True,
                                             context={'request': request})
         return self.get_paginated_response(serializer.data)
@@ -51,8 +71,8 @@ class CustomUserViewSet(UserViewSet):
         )
         serializer.is_valid(raise_exception=True)
 
-        follow = Follow.objects.create(user=user, author=author)
-        serializer = SubscriptionSerializer(follow,
+        Follow.objects.create(user=user, author=author)
+        serializer = SubscriptionSerializer(author,
                                             context={'request': request})
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -71,32 +91,155 @@ class CustomUserViewSet(UserViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (IsAdminOrReadOnlyPermission,)
+    cache_namespace = TAGS
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.request.method == 'GET':
+            return TagListSerializer
+        return TagSerializer
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (IsAdminOrReadOnlyPermission,)
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('^name',)
+    cache_namespace = INGREDIENTS
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: ingredient_index.search(
+            request.query_params.get('name', ''), INGREDIENT_SEARCH_LIMIT
+        ))
 
-class RecipesViewSet(viewsets.ModelViewSet):
+
+class RecipesViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     http_method_names = ('get', 'post', 'patch', 'delete')
     permission_classes = (IsAuthorOrReadOnlyPermission,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TagFilter
+    keyset_ordering = ('pub_date', 'id')
+    response_cache_namespace = RECIPES
+    response_cache_ignored_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
+    def get_serializer_class(self):
+        # Формы Browsable API строятся по полному сериализатору
+        if (self.action in ('list', 'search', 'cookable', 'feed')
+                and self.request.method == 'GET'):
+            return RecipeListSerializer
+        return RecipeSerializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        # Ошибки выгрузки (401, 404, 406) отдаются в JSON, а не текстом
+        # под типом application/pdf или text/csv
+        if (isinstance(response, Response) and response.status_code >= 400
+                and isinstance(response.accepted_renderer,
+                               ShoppingListRenderer)):
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = FastJSONRenderer.media_type
+        return response
+
+    def _reload(self, serializer):
+        # Ответ строится по тому же запросу, что и список рецептов:
+        # без отдельного запроса на каждый ингредиент.
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self._reload(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self._reload(serializer)
+
+    @action(methods=('get',), detail=False, keyset_ordering=None)
+    def search(self, request):
+        """Полнотекстовый поиск по названию, ингредиентам и тексту
+        рецептов, ?q=; фильтры списка тоже работают."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                'errors': 'Укажите поисковый запрос в параметре q'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        queryset = search_recipes(
+            self.filter_queryset(self.get_queryset()), query
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=('get',), detail=False, keyset_ordering=None)
+    def cookable(self, request):
+        """Рецепты из имеющихся продуктов: ?ingredients=1,2,3 и ?missing=k,
+        сколько ингредиентов может не хватать. Сначала готовые целиком,
+        у каждого рецепта — id недостающих в missing_ingredients."""
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            }
+            max_missing = int(request.query_params.get('missing', 0))
+        except ValueError:
+            return Response({
+                'errors': 'ingredients и missing должны быть целыми числами'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not ingredient_ids:
+            return Response({
+                'errors': 'Укажите ингредиенты в параметре ingredients'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= max_missing <= COOKABLE_MAX_MISSING:
+            return Response({
+                'errors': f'missing должен быть от 0 до {COOKABLE_MAX_MISSING}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(
+            cookable_index.match(ingredient_ids, max_missing)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        page = [(recipes[recipe_id], missing) for recipe_id, missing in page
+                if recipe_id in recipes]
+        data = self.get_serializer(
+            [recipe for recipe, _ in page], many=True
+        ).data
+        for item, (_, missing) in zip(data, page):
+            item['missing_ingredients'] = missing
+        return self.get_paginated_response(data)
+
+    @action(methods=('get',), detail=False,
+            permission_classes=(IsAuthenticated,), keyset_ordering=None)
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми. Пагинация всегда
+        курсорная: ссылка на следующую страницу — в next."""
+        paginator = KeysetPagination(
+            ('pub_date', 'id'), self.paginator.get_page_size(request)
+        )
+        keys = paginator.paginate_sources(
+            feed_sources(request.user.id), request
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in keys]
+        )
+        page = [recipes[recipe_id] for _, recipe_id in keys
+                if recipe_id in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(methods=('post', 'delete'), detail=True,
             permission_classes=(IsAuthenticated,))
@@ -117,53 +260,56 @@ class RecipesViewSet(viewsets.ModelViewSet):
         return None
 
     @action(methods=('get',), detail=False,
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(PDFRenderer, PlainTextRenderer, CSVRenderer,
+                              FastJSONRenderer))
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values_list(
-            'ingredient__name',
-            'ingredient__measurement_unit',
-            'amount'
-        )
-
-        # Добавление шрифта с поддержкой русского языка
-        font_path = 'fonts/94-font.ttf'
-        pdfmetrics.registerFont(TTFont('94-font', font_path))
+        export_format = request.accepted_renderer.format
+        if export_format not in EXPORTS:
+            export_format = DEFAULT_EXPORT
+        if export_format == 'pdf':
+            return self._pdf_response(
+                request, *render_pdf(get_shopping_list(request.user))
+            )
+        content_type, stream = EXPORTS[export_format]
 
-        response = HttpResponse(content_type='application/pdf')
+        response = StreamingHttpResponse(
+            stream(get_shopping_list(request.user)),
+            content_type=content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.pdf"'
+            f'attachment; filename="shopping_cart.{export_format}"'
         )
+        return response
 
-        pdf_create = canvas.Canvas(response)
-        pdf_create.setFont('94-font', FONT_SIZE)
-
-        pdf_file = dict()
-        for ingredient in ingredients:
-            name = ingredient[0]
-            if name not in pdf_file:
-                pdf_file[name] = {
-                    'measurement_unit': ingredient[1],
-                    'amount': ingredient[2]
-                }
-            else:
-                pdf_file[name]['amount'] += ingredient[2]
-
-        # Вывод списка покупок
-        pdf_create.drawString(X_CORD_TITLE, Y_CORD_TITLE, 'Список покупок')
-        x_cord = 100
-        y_cord = 750
-        for name, data in pdf_file.items():
-            pdf_create.drawString(
-                x_cord, y_cord, f'{name} - {data["amount"]} '
-                f'{data["measurement_unit"]}'
-            )
-            y_cord -= Y_REMOVAL
-
-        pdf_create.showPage()
-        pdf_create.save()
+    @action(methods=('get',), detail=False,
+            url_path=r'download_shopping_cart/(?P<digest>[0-9a-f]{64})',
+            url_name='shopping-cart-pdf',
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(PDFRenderer, FastJSONRenderer))
+    def shopping_cart_pdf(self, request, digest):
+        """Опрос PDF, который не успел отрендериться за время запроса."""
+        state, path = pdf_status(digest)
+        if state == 'missing':
+            raise Http404
+        return self._pdf_response(request, digest, path)
 
+    def _pdf_response(self, request, digest, path):
+        if path is None:
+            url = request.build_absolute_uri(
+                reverse('recipes-shopping-cart-pdf', args=(digest,))
+            )
+            return JsonResponse(
+                {'status': 'pending', 'url': url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': url, 'Retry-After': '1'},
+                json_dumps_params={'ensure_ascii': False}
+            )
+        response = FileResponse(
+            open(path, 'rb'), as_attachment=True,
+            filename='shopping_cart.pdf', content_type=PDF_CONTENT_TYPE
+        )
+        response.block_size = CHUNK_SIZE
         return response
 
     def _add(self, serializer, request, id):
@@ -188,3 +334,14 @@ class RecipesViewSet(viewsets.ModelViewSet):
         return Response({
             'errors': 'Рецепт уже удален'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def metrics(request):
+    """Метрики всех воркеров в текстовом формате Prometheus.
+
+    Наружу через nginx не проксируется, Prometheus ходит в backend:8000.
+    """
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -3,5 +3,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_foodgram.settings')
+os.environ.setdefault('ROOT_URLCONF', 'api_foodgram.asgi_urls')
 
 application = get_asgi_application()
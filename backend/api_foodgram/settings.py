@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +45,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'api_foodgram.urls'
+# ASGI подставляет api_foodgram.asgi_urls с async-путём чтения
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', default='api_foodgram.urls')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.profiling': {
+            'handlers': ('console',),
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
@@ -64,6 +85,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'api_foodgram.wsgi.application'
+ASGI_APPLICATION = 'api_foodgram.asgi.application'
 
 
 DATABASES = {
@@ -79,6 +101,17 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -129,6 +162,15 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS':
         'api.paginations.Paginate',
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 
@@ -153,6 +195,59 @@ X_CORD_TITLE = 250
 Y_CORD_TITLE = 800
 Y_REMOVAL = 20
 FONT_SIZE = 12
+X_CORD_TEXT = 100
+Y_CORD_TEXT = 750
+Y_CORD_BOTTOM = 50
+CHUNK_SIZE = 8192
+PDF_RENDER_QUEUE = os.getenv('PDF_RENDER_QUEUE',
+                             default='api.pdf_jobs.ProcessPoolQueue')
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', default=2))
+# Сколько секунд запрос ждёт рендер, прежде чем ответить 202
+PDF_INLINE_TIMEOUT = float(os.getenv('PDF_INLINE_TIMEOUT', default=0.5))
+PDF_RESULTS_DIR = os.getenv(
+    'PDF_RESULTS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-pdf')
+)
+PDF_RESULT_TTL = 24 * 60 * 60
+PDF_PENDING_TIMEOUT = 60
+INGREDIENT_SEARCH_LIMIT = 50
+RECIPE_SEARCH_INDEX_TTL = 300
+RECIPE_SEARCH_FALLBACK_LIMIT = 500
+COOKABLE_INDEX_TTL = 300
+COOKABLE_MAX_MISSING = 5
+# Рецепты авторов с таким числом подписчиков не раскладываются по лентам,
+# а читаются при запросе ленты
+TIMELINE_FANOUT_LIMIT = int(
+    os.getenv('TIMELINE_FANOUT_LIMIT', default=10000)
+)
+CATALOG_CACHE_MAX_AGE = 60
+# Срок ключа версии справочника: за это время воркеры с LocMemCache
+# сходятся к новой версии (0 — без срока, только для общего кеша)
+CACHE_VERSION_TIMEOUT = int(os.getenv('CACHE_VERSION_TIMEOUT', default=60))
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=60))
+# Доля запросов, для которых пишется профиль (0 — middleware выключен)
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_PROFILING_SAMPLE_RATE', default=0)
+)
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+SLOW_QUERY_FINGERPRINTS = 5
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+# Общий каталог воркеров gunicorn; пусто — метрики только своего процесса
+METRICS_DIR = os.getenv('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = 1
+ASYNC_READ_WORKERS = int(os.getenv('ASYNC_READ_WORKERS', default=8))
+USER_RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('USER_RELATIONS_CACHE_TIMEOUT', default=0)
+)
+IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+MAX_IMAGE_SIDE = 5000
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', default=10 * 1024 * 1024))
+BASE64_CHUNK_SIZE = 64 * 1024
+THUMBNAIL_WIDTHS = {'small': 240, 'medium': 480, 'large': 960}
+THUMBNAIL_QUALITY = 80
+IMAGE_TASK_QUEUE = os.getenv('IMAGE_TASK_QUEUE',
+                             default='recipes.images.ThreadPoolQueue')
+IMAGE_WORKERS = 2
 
 
 STATIC_URL = '/static/'
@@ -0,0 +1,10 @@
+import os
+from pathlib import Path
+
+
+def on_starting(server):
+    # Счётчики прошлого запуска не должны попадать в /metrics
+    directory = os.getenv('METRICS_DIR')
+    if directory:
+        for path in Path(directory).glob('*.json'):
+            path.unlink()
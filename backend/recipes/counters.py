@@ -0,0 +1,31 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+# Денормализованные счётчики: (модель-владелец, поле счётчика,
+# модель-источник, поле внешнего ключа в источнике).
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'shopping_cart_count', 'recipes.ShoppingCart',
+     'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'followers_count', 'recipes.Follow', 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик одним UPDATE, не опускаясь ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def recount(apps):
+    """Пересчитывает все счётчики по исходным таблицам."""
+    for owner, field, source, fk in COUNTERS:
+        source_model = apps.get_model(source)
+        counts = source_model.objects.filter(
+            **{fk: OuterRef('pk')}
+        ).order_by().values(fk).annotate(total=Count('pk')).values('total')
+        apps.get_model(owner).objects.update(
+            **{field: Coalesce(Subquery(counts), 0)}
+        )
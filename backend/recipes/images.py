@@ -0,0 +1,133 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+from PIL import Image, features
+
+from api_foodgram.settings import (IMAGE_TASK_QUEUE, IMAGE_WORKERS,
+                                   THUMBNAIL_QUALITY, THUMBNAIL_WIDTHS)
+
+# WebP, если Pillow собран с libwebp, иначе JPEG
+if features.check('webp'):
+    THUMBNAIL_FORMAT, THUMBNAIL_EXT = 'WEBP', 'webp'
+else:
+    THUMBNAIL_FORMAT, THUMBNAIL_EXT = 'JPEG', 'jpg'
+
+logger = logging.getLogger(__name__)
+
+# Миниатюры записываются через update() без post_save
+thumbnails_ready = Signal()
+
+
+class ThreadPoolQueue:
+    """Очередь фоновых задач на пуле потоков текущего процесса.
+
+    Замена внешнему брокеру для разработки и тестов: другой бэкенд
+    подключается через IMAGE_TASK_QUEUE и должен реализовать submit().
+    """
+
+    def __init__(self, max_workers=IMAGE_WORKERS):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='images'
+        )
+
+    @staticmethod
+    def _run(func, *args):
+        try:
+            return func(*args)
+        except Exception:
+            logger.exception('Фоновая задача %s упала', func.__name__)
+            raise
+        finally:
+            # У каждого потока своё соединение с базой
+            connections.close_all()
+
+    def submit(self, func, *args):
+        return self.executor.submit(self._run, func, *args)
+
+
+class ImmediateQueue:
+    """Выполняет задачу сразу, в вызывающем потоке."""
+
+    def submit(self, func, *args):
+        return func(*args)
+
+
+image_queue = import_string(IMAGE_TASK_QUEUE)()
+
+
+def _resize(image, width):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((width, image.height))
+    if THUMBNAIL_FORMAT == 'JPEG' and thumbnail.mode != 'RGB':
+        thumbnail = thumbnail.convert('RGB')
+    buffer = BytesIO()
+    thumbnail.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def make_thumbnails(recipe_id, image_name):
+    """Сохраняет миниатюры картинки рецепта и записывает их в thumbnails."""
+    from recipes.models import Recipe
+
+    with default_storage.open(image_name) as image_file:
+        image = Image.open(image_file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    stem = Path(image_name).stem
+    thumbnails = {'source': image_name}
+    for size, width in THUMBNAIL_WIDTHS.items():
+        thumbnails[size] = default_storage.save(
+            f'thumbnails/{stem}_{width}.{THUMBNAIL_EXT}',
+            _resize(image, width)
+        )
+    with transaction.atomic():
+        previous = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, image=image_name
+        ).values_list('thumbnails', flat=True).first()
+        if previous is None:
+            # Картинку заменили или рецепт удалили, пока строились
+            # миниатюры: новые файлы никому не нужны
+            delete_thumbnails(thumbnails)
+            return None
+        Recipe.objects.filter(pk=recipe_id).update(thumbnails=thumbnails)
+    delete_thumbnails({
+        size: name for size, name in previous.items()
+        if name not in thumbnails.values()
+    })
+    thumbnails_ready.send(sender=Recipe, recipe_id=recipe_id)
+    return thumbnails
+
+
+def delete_thumbnails(thumbnails):
+    """Удаляет из хранилища файлы миниатюр (исходная картинка остаётся)."""
+    for size in THUMBNAIL_WIDTHS:
+        name = thumbnails.get(size)
+        if name:
+            default_storage.delete(name)
+
+
+def schedule_thumbnails(recipe):
+    if recipe.image and recipe.thumbnails.get('source') != recipe.image.name:
+        return image_queue.submit(
+            make_thumbnails, recipe.pk, recipe.image.name
+        )
+    return None
+
+
+def thumbnail_url(recipe, size):
+    """URL миниатюры, если она готова для текущей картинки рецепта."""
+    thumbnails = recipe.thumbnails
+    if size and thumbnails.get('source') == recipe.image.name:
+        name = thumbnails.get(size)
+        if name:
+            return default_storage.url(name)
+    return None
@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
+
+DEFAULT_PATH = settings.BASE_DIR / 'data' / 'ingredients.csv'
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row['name'], row['measurement_unit']
+
+
+def read_json(path):
+    # В стандартной библиотеке нет потокового парсера JSON,
+    # файл справочника небольшой и читается целиком.
+    with open(path, encoding='utf-8') as jsonfile:
+        for row in json.load(jsonfile):
+            yield row['name'], row['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+class Command(BaseCommand):
+    help = ('Загружает справочник ингредиентов из CSV или JSON. '
+            'Существующие пары (название, единица) пропускаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_PATH))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.'
+        )
+
+    def bulk_load(self, rows, batch_size):
+        total = 0
+        for batch in batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ],
+                ignore_conflicts=True
+            )
+            total += len(batch)
+        return total
+
+    def copy_load(self, rows):
+        total = 0
+        with SpooledTemporaryFile(mode='w+', newline='') as buffer:
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(row)
+                total += 1
+            buffer.seek(0)
+
+            table = connection.ops.quote_name(Ingredient._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'CREATE TEMP TABLE ingredient_import '
+                    '(name varchar(200), measurement_unit varchar(200)) '
+                    'ON COMMIT DROP'
+                )
+                cursor.copy_expert(
+                    'COPY ingredient_import FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'SELECT DISTINCT name, measurement_unit '
+                    'FROM ingredient_import '
+                    'ON CONFLICT (name, measurement_unit) DO NOTHING'
+                )
+        return total
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f'Неизвестный формат файла {path.name}: нужен CSV или JSON'
+            )
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            before = Ingredient.objects.count()
+            if use_copy:
+                total = self.copy_load(reader(path))
+            else:
+                total = self.bulk_load(reader(path), options['batch_size'])
+            created = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - started
+        ingredients_loaded.send(sender=Ingredient, created=created)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"COPY" if use_copy else "bulk_create"}: '
+            f'добавлено {created} из {total} строк '
+            f'за {elapsed:.2f} с ({total / elapsed:.0f} строк/с)'
+        ))
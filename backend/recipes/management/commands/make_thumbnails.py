@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для рецептов, у которых их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить миниатюры для всех рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        for recipe in Recipe.objects.exclude(image='').iterator():
+            if (options['all']
+                    or recipe.thumbnails.get('source') != recipe.image.name):
+                make_thumbnails(recipe.pk, recipe.image.name)
+                built += 1
+        self.stdout.write(f'Миниатюры построены для {built} рецептов')
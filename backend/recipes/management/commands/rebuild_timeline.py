@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import timeline
+from recipes.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = ('Заново собирает ленты подписок по подпискам и рецептам, '
+            'например после смены TIMELINE_FANOUT_LIMIT.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        timeline.rebuild()
+        self.stdout.write(
+            f'Строк в лентах: {TimelineEntry.objects.count()}'
+        )
@@ -0,0 +1,16 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, списков покупок, '
+            'рецептов и подписчиков, если они разошлись с данными.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recount(apps)
+        for owner, field, *_ in COUNTERS:
+            self.stdout.write(f'{owner}.{field}: пересчитано')
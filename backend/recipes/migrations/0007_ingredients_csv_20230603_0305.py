@@ -1,26 +1,34 @@
 # Generated by Django 3.2 on 2023-06-03 00:05
 
+from django.conf import settings
 from django.db import migrations
 import csv
 
 
+DATA_PATH = settings.BASE_DIR / 'data' / 'ingredients.csv'
+BATCH_SIZE = 1000
+
+
 def add_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    with open('./data/ingredients.csv', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            Ingredient.objects.create(
-                name=row['name'],
-                measurement_unit=row['measurement_unit']
-            )
+    with open(DATA_PATH, encoding='utf-8') as csvfile:
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=row['name'],
+                    measurement_unit=row['measurement_unit']
+                )
+                for row in csv.DictReader(csvfile)
+            ),
+            batch_size=BATCH_SIZE
+        )
 
 
 def remove_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    with open('./data/ingredients.csv', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            Ingredient.objects.filter(name=row['name']).delete()
+    with open(DATA_PATH, encoding='utf-8') as csvfile:
+        names = {row['name'] for row in csv.DictReader(csvfile)}
+    Ingredient.objects.filter(name__in=names).delete()
 
 
 class Migration(migrations.Migration):
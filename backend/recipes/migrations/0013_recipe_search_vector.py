@@ -0,0 +1,132 @@
+from django.db import migrations
+
+# Колонка search_vector есть только в PostgreSQL и целиком ведётся
+# триггерами: название (вес A), ингредиенты (B) и текст (C) рецепта.
+SEARCH = (
+    'ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector '
+    'tsvector',
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector(
+        bigint, text, text
+    ) RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector('russian', coalesce($2, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM recipes_recipeingredient AS item
+                JOIN recipes_ingredient AS ingredient
+                    ON ingredient.id = item.ingredient_id
+                WHERE item.recipe_id = $1
+            ), '')), 'B')
+            || setweight(to_tsvector('russian', coalesce($3, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := recipes_recipe_search_vector(
+            NEW.id, NEW.name, NEW.text
+        );
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipeingredient_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE recipes_recipe
+            SET search_vector = recipes_recipe_search_vector(id, name, text)
+            WHERE id IN (SELECT recipe_id FROM new_rows);
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE recipes_recipe
+            SET search_vector = recipes_recipe_search_vector(id, name, text)
+            WHERE id IN (SELECT recipe_id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_ingredient_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE recipes_recipe
+        SET search_vector = recipes_recipe_search_vector(id, name, text)
+        WHERE id IN (
+            SELECT recipe_id FROM recipes_recipeingredient
+            WHERE ingredient_id = NEW.id
+        );
+        RETURN NULL;
+    END
+    $$
+    """,
+    'CREATE TRIGGER recipes_recipe_search '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_trigger()',
+    # Триггеры на оператор: bulk_create ингредиентов рецепта
+    # пересчитывает вектор один раз, а не на каждую строку
+    'CREATE TRIGGER recipes_recipeingredient_search_insert '
+    'AFTER INSERT ON recipes_recipeingredient '
+    'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT '
+    'EXECUTE PROCEDURE recipes_recipeingredient_search_trigger()',
+    'CREATE TRIGGER recipes_recipeingredient_search_update '
+    'AFTER UPDATE ON recipes_recipeingredient '
+    'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+    'FOR EACH STATEMENT '
+    'EXECUTE PROCEDURE recipes_recipeingredient_search_trigger()',
+    'CREATE TRIGGER recipes_recipeingredient_search_delete '
+    'AFTER DELETE ON recipes_recipeingredient '
+    'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT '
+    'EXECUTE PROCEDURE recipes_recipeingredient_search_trigger()',
+    'CREATE TRIGGER recipes_ingredient_search '
+    'AFTER UPDATE OF name ON recipes_ingredient FOR EACH ROW '
+    'WHEN (OLD.name IS DISTINCT FROM NEW.name) '
+    'EXECUTE PROCEDURE recipes_ingredient_search_trigger()',
+    'UPDATE recipes_recipe '
+    'SET search_vector = recipes_recipe_search_vector(id, name, text)',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+DROP_SEARCH = (
+    'DROP TRIGGER IF EXISTS recipes_ingredient_search '
+    'ON recipes_ingredient',
+    'DROP TRIGGER IF EXISTS recipes_recipeingredient_search_delete '
+    'ON recipes_recipeingredient',
+    'DROP TRIGGER IF EXISTS recipes_recipeingredient_search_update '
+    'ON recipes_recipeingredient',
+    'DROP TRIGGER IF EXISTS recipes_recipeingredient_search_insert '
+    'ON recipes_recipeingredient',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_ingredient_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipeingredient_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector(bigint, text, text)',
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(SEARCH),
+            run_on_postgresql(DROP_SEARCH)
+        )
+    ]
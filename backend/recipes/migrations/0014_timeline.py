@@ -0,0 +1,78 @@
+# Generated by Django 3.2 on 2026-10-18 05:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Порог раскладки на момент миграции: дальше его задаёт настройка
+# TIMELINE_FANOUT_LIMIT, а после её смены ленты пересобирает команда
+# rebuild_timeline
+FANOUT_LIMIT = 10000
+FILL = (
+    '{insert} {timeline} (user_id, recipe_id, author_id, pub_date) '
+    'SELECT follow.user_id, recipe.id, recipe.author_id, recipe.pub_date '
+    'FROM {follow} follow '
+    'JOIN {recipe} recipe ON recipe.author_id = follow.author_id '
+    'JOIN {user} author ON author.id = follow.author_id '
+    'WHERE author.followers_count < %s {suffix}'
+)
+
+
+def fill_timeline(apps, schema_editor):
+    ops = schema_editor.connection.ops
+    tables = {
+        name: schema_editor.quote_name(
+            apps.get_model(app_label, model)._meta.db_table
+        )
+        for name, app_label, model in (
+            ('timeline', 'recipes', 'TimelineEntry'),
+            ('follow', 'recipes', 'Follow'),
+            ('recipe', 'recipes', 'Recipe'),
+            ('user', 'users', 'CustomUser'),
+        )
+    }
+    schema_editor.execute(FILL.format(
+        insert=ops.insert_statement(ignore_conflicts=True),
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        **tables
+    ), (FANOUT_LIMIT,))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_search_vector'),
+        ('users', '0003_auto_20261018_0435'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Лента подписок',
+                'ordering': ('-pub_date', '-recipe'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'recipe'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-18 06:19
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_recipe_ingredients(apps, schema_editor):
+    # После слияния ингредиентов в 0011 у рецепта могли остаться две
+    # строки одного ингредиента: единица у них общая, количества
+    # складываются в строку с меньшим id
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).annotate(
+        keep_id=Min('id'), amount_sum=Sum('amount'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        RecipeIngredient.objects.filter(id=duplicate['keep_id']).update(
+            amount=duplicate['amount_sum']
+        )
+        RecipeIngredient.objects.filter(
+            recipe_id=duplicate['recipe_id'],
+            ingredient_id=duplicate['ingredient_id']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_recipe_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
@@ -2,7 +2,8 @@ from typing import Optional
 
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db.models import Exists, F, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
 
 from users.models import CustomUser
 
@@ -33,6 +34,12 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -55,6 +62,40 @@ class RecipeQuerySet(models.QuerySet):
             ),
         )
 
+    def with_related(self):
+        """Всё, что нужно RecipeSerializer, за фиксированное число запросов.
+
+        Флаги is_favorited/is_in_shopping_cart/is_subscribed берутся
+        из api.cache.UserRelations, а не из подзапросов.
+        """
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit: Optional[int] = None):
+        """Последние limit рецептов каждого автора одним запросом."""
+        queryset = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return queryset
+        ranked = queryset.annotate(
+            author_position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc())
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            'WHERE ranked.author_position <= %s '
+            'ORDER BY ranked.author_position',
+            (*params, limit)
+        )
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -66,6 +107,11 @@ class Recipe(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название рецепта')
     text = models.TextField(verbose_name='Текст')
     image = models.ImageField(verbose_name='Изображение')
+    thumbnails = models.JSONField(
+        verbose_name='Миниатюры',
+        default=dict,
+        blank=True
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',
@@ -86,11 +132,25 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='recipe_author_pub_date_idx'
+            )
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -118,6 +178,12 @@ class RecipeIngredient(models.Model):
         ordering = ('-id',)
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.ingredient} в {self.recipe}'
@@ -151,6 +217,58 @@ class Follow(models.Model):
         return f'{self.user} подписался на {self.author}'
 
 
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Строки раскладываются при публикации рецепта и подписке
+    (recipes.timeline), чтобы лента читалась по индексу одного
+    пользователя, а не соединением Follow с Recipe.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', 'pub_date', 'recipe'),
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        ]
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self) -> str:
+        return f'{self.recipe} в ленте {self.user}'
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -0,0 +1,87 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from recipes import timeline
+from recipes.counters import change_counter
+from recipes.images import delete_thumbnails, image_queue, schedule_thumbnails
+from recipes.models import Favorite, Follow, Recipe, ShoppingCart
+from users.models import CustomUser
+
+DELTAS = {post_save: 1, post_delete: -1}
+
+# Массовая загрузка справочника идёт через bulk_create/COPY без post_save,
+# поэтому о ней сообщается отдельным сигналом.
+ingredients_loaded = Signal()
+# То же для ингредиентов рецепта, которые пишутся bulk_create/bulk_update.
+recipe_ingredients_changed = Signal()
+
+
+def _delta(signal, kwargs):
+    if signal is post_save and not kwargs.get('created'):
+        return 0
+    return DELTAS[signal]
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def update_favorites_count(signal, instance, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', delta)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def update_shopping_cart_count(signal, instance, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_counter(
+            Recipe, instance.recipe_id, 'shopping_cart_count', delta
+        )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipes_count(signal, instance, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', delta)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def update_followers_count(signal, instance, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_counter(
+            CustomUser, instance.author_id, 'followers_count', delta
+        )
+
+
+# Подключается после update_followers_count и видит новый счётчик
+@receiver((post_save, post_delete), sender=Follow)
+def update_timeline(signal, instance, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta > 0:
+        timeline.follow(instance.user_id, instance.author_id)
+    elif delta < 0:
+        timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance.pk, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_thumbnails(instance, update_fields, **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        transaction.on_commit(partial(schedule_thumbnails, instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_thumbnails(instance, **kwargs):
+    if instance.thumbnails:
+        transaction.on_commit(partial(
+            image_queue.submit, delete_thumbnails, instance.thumbnails
+        ))
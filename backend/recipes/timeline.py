@@ -0,0 +1,116 @@
+from django.db import connections, router, transaction
+
+from api_foodgram.settings import TIMELINE_FANOUT_LIMIT
+from recipes.models import Follow, Recipe, TimelineEntry
+from users.models import CustomUser
+
+# Одна вставка на событие: строки ленты собираются в базе из подписок
+# и рецептов, без выгрузки id подписчиков в Python. Авторы, у которых
+# TIMELINE_FANOUT_LIMIT подписчиков и больше, пропускаются: их рецепты
+# лента читает напрямую (fan-out on read).
+FILL = (
+    '{insert} {timeline} (user_id, recipe_id, author_id, pub_date) '
+    'SELECT follow.user_id, recipe.id, recipe.author_id, recipe.pub_date '
+    'FROM {follow} follow '
+    'JOIN {recipe} recipe ON recipe.author_id = follow.author_id '
+    'JOIN {user} author ON author.id = follow.author_id '
+    'WHERE author.followers_count < %s{condition} {suffix}'
+)
+
+
+def _fill(condition='', params=()):
+    connection = connections[router.db_for_write(TimelineEntry)]
+    quote = connection.ops.quote_name
+    sql = FILL.format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        timeline=quote(TimelineEntry._meta.db_table),
+        follow=quote(Follow._meta.db_table),
+        recipe=quote(Recipe._meta.db_table),
+        user=quote(CustomUser._meta.db_table),
+        condition=f' AND {condition}' if condition else '',
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (TIMELINE_FANOUT_LIMIT, *params))
+
+
+def _sync_author(author_id, condition='', params=()):
+    """Приводит строки автора в лентах к его текущему числу подписчиков.
+
+    Строка автора блокируется до конца транзакции, поэтому подписки,
+    отписки и новые рецепты одного автора обрабатываются по очереди.
+    Решение принимается по состоянию, а не по изменению счётчика: гонка,
+    перешагнувшая TIMELINE_FANOUT_LIMIT, не оставляет лишних строк и не
+    теряет нужные.
+    """
+    with transaction.atomic(using=router.db_for_write(TimelineEntry)):
+        followers = CustomUser.objects.select_for_update().filter(
+            pk=author_id
+        ).values_list('followers_count', flat=True).first()
+        entries = TimelineEntry.objects.filter(author_id=author_id)
+        if followers is None or followers >= TIMELINE_FANOUT_LIMIT:
+            # Популярный автор читается напрямую, его строки не нужны
+            entries.delete()
+        elif not entries.exists():
+            # Автор только что опустился ниже порога (или строк у него
+            # ещё не было): раскладываются все его рецепты
+            _fill('follow.author_id = %s', (author_id,))
+        elif condition:
+            _fill(condition, params)
+
+
+def fan_out(recipe_id, author_id):
+    """Кладёт новый рецепт в ленты подписчиков автора."""
+    _sync_author(author_id, 'recipe.id = %s', (recipe_id,))
+
+
+def follow(user_id, author_id):
+    """Добавляет в ленту рецепты автора, на которого подписались.
+
+    Вызывается после обновления followers_count: если подписка сделала
+    автора слишком популярным, его строки удаляются из всех лент.
+    """
+    _sync_author(
+        author_id, 'follow.user_id = %s AND follow.author_id = %s',
+        (user_id, author_id)
+    )
+
+
+def unfollow(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки.
+
+    Если автор опустился ниже TIMELINE_FANOUT_LIMIT, его рецепты снова
+    раскладываются по лентам оставшихся подписчиков.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+    _sync_author(author_id)
+
+
+def rebuild():
+    """Заново собирает все ленты по подпискам и рецептам."""
+    TimelineEntry.objects.all().delete()
+    _fill()
+
+
+def feed_sources(user_id):
+    """Источники ленты для KeysetPagination.paginate_sources: строки
+    TimelineEntry и рецепты популярных авторов, прочитанные напрямую.
+    Поля источников соответствуют ('pub_date', 'id')."""
+    popular = list(Follow.objects.filter(
+        user_id=user_id,
+        author__followers_count__gte=TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    if not popular:
+        return [(entries, ('pub_date', 'recipe_id'))]
+    return [
+        # Строки, оставшиеся от времени, когда автор был менее популярен,
+        # не читаются, чтобы рецепты не повторялись
+        (entries.exclude(author_id__in=popular), ('pub_date', 'recipe_id')),
+        (Recipe.objects.filter(author_id__in=popular),
+         ('pub_date', 'id')),
+    ]
@@ -0,0 +1,60 @@
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from users.models import CustomUser
+
+
+@override_settings(ROOT_URLCONF='api_foodgram.asgi_urls')
+class AsyncReadViewTest(TransactionTestCase):
+    """Чтение через ASGI: view выполняются в пуле потоков, а ответ
+    отдаёт цикл событий. Данные нужны в закоммиченном виде, иначе
+    потоки пула их не увидят."""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+            first_name='reader', last_name='reader'
+        )
+        ingredient = Ingredient.objects.create(
+            name='мука для теста', measurement_unit='г'
+        )
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                author=user, name=f'recipe{i}', text='text',
+                image='recipes/images/recipe.png', cooking_time=10,
+                # Миниатюры уже есть: фоновая задача не ищет картинку
+                thumbnails={'source': 'recipes/images/recipe.png'}
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        # AsyncClient Django 3.2 принимает заголовки ASGI, а не HTTP_*
+        self.headers = {
+            'authorization': f'Token {Token.objects.create(user=user)}'
+        }
+
+    async def test_shopping_cart_streaming_exports(self):
+        client = AsyncClient()
+        for export_format, content_type in (('txt', 'text/plain'),
+                                            ('csv', 'text/csv')):
+            with self.subTest(format=export_format):
+                # Параметры только в пути: data AsyncClient Django 3.2
+                # превращает в заголовок
+                response = await client.get(
+                    '/api/recipes/download_shopping_cart/'
+                    f'?format={export_format}', **self.headers
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                content = b''.join(response.streaming_content).decode()
+                self.assertIn('мука для теста', content)
+                self.assertIn('200', content)
+
+    async def test_recipe_list(self):
+        response = await AsyncClient().get('/api/recipes/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
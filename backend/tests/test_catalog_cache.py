@@ -0,0 +1,62 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import INGREDIENTS, bump_version, get_version
+from recipes.models import Ingredient
+
+URL = '/api/ingredients/?name=кешируемый'
+
+
+class CatalogCacheTest(TestCase):
+    """Версии справочников и индекс ингредиентов между воркерами."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, response):
+        return [row['name'] for row in response.json()]
+
+    def test_change_from_another_worker(self):
+        Ingredient.objects.create(
+            name='кешируемый сахар', measurement_unit='г'
+        )
+        first = self.client.get(URL)
+        self.assertEqual(self.names(first), ['кешируемый сахар'])
+        response = self.client.get(URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # Другой воркер записал ингредиент и поднял версию в общем кеше:
+        # сигналы этого процесса не срабатывали
+        Ingredient.objects.bulk_create([
+            Ingredient(name='кешируемый мёд', measurement_unit='г')
+        ])
+        bump_version(INGREDIENTS)
+        second = self.client.get(URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(
+            self.names(second), ['кешируемый мёд', 'кешируемый сахар']
+        )
+
+    def test_signals_bump_version(self):
+        version = get_version(INGREDIENTS)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(
+                name='кешируемый перец', measurement_unit='г'
+            )
+        self.assertGreater(get_version(INGREDIENTS), version)
+        self.assertEqual(
+            self.names(self.client.get(URL)), ['кешируемый перец']
+        )
+
+    @mock.patch('api.cache.CACHE_VERSION_TIMEOUT', 1)
+    def test_version_expires(self):
+        # С кешем в памяти процесса версия, поднятая в другом воркере,
+        # сюда не попадает: ключ истекает, и версия начинается заново
+        version = get_version(INGREDIENTS)
+        time.sleep(1.1)
+        self.assertGreater(get_version(INGREDIENTS), version)
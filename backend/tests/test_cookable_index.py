@@ -0,0 +1,136 @@
+import random
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cookable_index import CookableIndex
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+
+
+class CookableIndexTest(TestCase):
+    """CookableIndex.match сверяется с перебором всех рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.random = random.Random(25)
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='author', last_name='author'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ingredient{i}',
+                                      measurement_unit='г').id
+            for i in range(20)
+        ]
+        for _ in range(80):
+            cls.create_recipe(cls.sample_ingredients())
+
+    @classmethod
+    def sample_ingredients(cls):
+        # Частые ингредиенты попадают в плотные списки, редкие — в sparse
+        weights = [1 / (rank + 1) for rank in range(len(cls.ingredients))]
+        return set(cls.random.choices(
+            cls.ingredients, weights, k=cls.random.randint(1, 8)
+        ))
+
+    @classmethod
+    def create_recipe(cls, ingredient_ids):
+        recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=1)
+            for ingredient_id in ingredient_ids
+        )
+        return recipe
+
+    def expected(self, have, max_missing):
+        recipes = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ):
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        rows = []
+        for recipe_id, ingredients in recipes.items():
+            matched = len(ingredients & have)
+            missing = sorted(ingredients - have)
+            if matched and len(missing) <= max_missing:
+                # Готовые целиком — только по новизне, остальные ещё и
+                # по числу имеющихся
+                share = -matched if missing else 0
+                rows.append(
+                    ((len(missing), share, -recipe_id), (recipe_id, missing))
+                )
+        return [match for _, match in sorted(rows)]
+
+    def assert_matches_brute_force(self, index):
+        for _ in range(30):
+            have = set(self.random.sample(
+                self.ingredients, self.random.randint(1, 12)
+            ))
+            for max_missing in range(4):
+                with self.subTest(have=sorted(have), missing=max_missing):
+                    self.assertEqual(
+                        list(index.match(have, max_missing)),
+                        self.expected(have, max_missing)
+                    )
+
+    def test_match(self):
+        # На 80 рецептах порог плотности по умолчанию — один рецепт, и
+        # почти все списки плотные; при DENSE_SHARE=8 — десять рецептов,
+        # и редкие ингредиенты уходят в sparse
+        for dense_share in (64, 8):
+            with mock.patch('api.cookable_index.DENSE_SHARE', dense_share):
+                index = CookableIndex()
+                self.assert_matches_brute_force(index)
+        self.assertTrue(index._get_postings().sparse)
+
+    def test_incremental_updates(self):
+        index = CookableIndex()
+        index.match({self.ingredients[0]}, 0)
+        for _ in range(10):
+            recipe = self.create_recipe(self.sample_ingredients())
+            index.update(recipe.id)
+        for recipe in Recipe.objects.order_by('?')[:10]:
+            RecipeIngredient.objects.filter(recipe=recipe).delete()
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                                 amount=1)
+                for ingredient_id in self.sample_ingredients()
+            )
+            index.update(recipe.id)
+        for recipe in Recipe.objects.order_by('?')[:5]:
+            recipe_id = recipe.id
+            recipe.delete()
+            index.remove(recipe_id)
+        self.assert_matches_brute_force(index)
+
+    def test_missing_from_ranked_snapshot(self):
+        index = CookableIndex()
+        have = set(self.ingredients[:5])
+        matches = index.match(have, 3)
+        before = list(matches)
+        recipe_id = before[0][0]
+        RecipeIngredient.objects.filter(recipe_id=recipe_id).delete()
+        index.ttl = 0
+        index.match(have, 3)
+        self.assertEqual(list(matches), before)
+
+    def test_api(self):
+        have = self.ingredients[:6]
+        # Общий индекс процесса мог остаться от других тестов
+        with mock.patch('api.views.cookable_index', CookableIndex()):
+            response = APIClient().get('/api/recipes/cookable/', {
+                'ingredients': ','.join(map(str, have)), 'missing': 2,
+                'page_size': 100,
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(recipe['id'], recipe['missing_ingredients'])
+             for recipe in response.json()['results']],
+            self.expected(set(have), 2)
+        )
@@ -0,0 +1,79 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from api.filters import TagFilter
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import CustomUser
+
+INDEX_SCAN = re.compile(
+    r'Index (?:Only )?Scan(?: Backward)? (?:using|on) (\S+)'
+)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN только в PostgreSQL')
+class RecipeFilterPlanTest(TestCase):
+    """Фильтры списка рецептов идут по индексам и полусоединениям
+    (EXISTS), без JOIN с последующим DISTINCT по рецептам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+            first_name='reader', last_name='reader'
+        )
+        tags = [
+            Tag.objects.create(name=f'tag{i}', color='#ffffff', slug=f'tag{i}')
+            for i in range(2)
+        ]
+        for i in range(20):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'recipe{i}', text='text',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+            recipe.tags.set(tags[:1 + i % 2])
+            if i % 3 == 0:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def filtered(self, data):
+        request = RequestFactory().get('/api/recipes/', data)
+        request.user = self.user
+        return TagFilter(
+            request.GET, queryset=Recipe.objects.all(), request=request
+        ).qs.order_by('-pub_date')[:6]
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            # На двадцати строках планировщик иначе всегда выбирает
+            # последовательное чтение
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_author_uses_author_pub_date_index(self):
+        plan = self.explain(self.filtered({'author': self.user.id}))
+        self.assertIn('recipe_author_pub_date_idx', INDEX_SCAN.findall(plan))
+
+    def test_exists_filters_use_semi_join(self):
+        cases = (
+            ({'tags': ['tag0', 'tag1']}, 'recipes_recipe_tags'),
+            ({'is_favorited': 1}, 'recipes_favorite'),
+            ({'is_in_shopping_cart': 1}, 'recipes_shoppingcart'),
+        )
+        for data, table in cases:
+            with self.subTest(**data):
+                queryset = self.filtered(data)
+                self.assertIn('EXISTS', str(queryset.query))
+                plan = self.explain(queryset)
+                # Полусоединение PostgreSQL может выполнить и как
+                # соединение с уникализированной по recipe_id таблицей
+                self.assertTrue(
+                    'Semi Join' in plan or any(
+                        index.startswith(table)
+                        for index in INDEX_SCAN.findall(plan)
+                    ), plan
+                )
+                self.assertNotIn('Unique', plan)
+                self.assertNotIn('Group Key: recipes_recipe.', plan)
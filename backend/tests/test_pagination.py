@@ -0,0 +1,103 @@
+import json
+from base64 import b64encode
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Follow, Recipe
+from users.models import CustomUser
+
+
+def cursor(values):
+    return b64encode(json.dumps(values).encode()).decode()
+
+
+class KeysetCursorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, author = (
+            CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass',
+                first_name=name, last_name=name
+            )
+            for name in ('reader', 'author')
+        )
+        Follow.objects.create(user=cls.user, author=author)
+        for i in range(5):
+            Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_pages_follow_next(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        self.assertEqual(
+            self.walk('/api/recipes/?pagination=cursor&page_size=2'), expected
+        )
+        self.assertEqual(self.walk('/api/recipes/feed/?page_size=2'), expected)
+
+    def test_invalid_cursor_is_not_found(self):
+        recipe = Recipe.objects.first()
+        cursors = (
+            'not base64!',
+            cursor({'a': 1}),
+            cursor([recipe.pub_date.isoformat()]),
+            cursor(['notadate', 1]),
+            cursor([{'a': 1}, 1]),
+            cursor(['2020-01-01', 'x']),
+            cursor(['2020-01-01T00:00:00', 1]),
+            cursor(['2020-13-01T00:00:00+00:00', 1]),
+            cursor([recipe.pub_date.isoformat(), True]),
+            cursor([recipe.pub_date.isoformat(), 1.5]),
+            cursor([recipe.pub_date.isoformat(), 2 ** 70]),
+        )
+        for url in ('/api/recipes/', '/api/recipes/feed/'):
+            for value in cursors:
+                with self.subTest(url=url, cursor=value):
+                    response = self.client.get(
+                        url, {'pagination': 'cursor', 'cursor': value}
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+    def test_subscriptions_follow_order(self):
+        # Авторы с меньшим id, подписка на которых оформлена позже
+        authors = [
+            CustomUser.objects.create_user(
+                username=f'late{i}', email=f'late{i}@example.com',
+                password='pass', first_name='late', last_name='late'
+            )
+            for i in range(3)
+        ]
+        for author in reversed(authors):
+            Follow.objects.create(user=self.user, author=author)
+        expected = list(Follow.objects.filter(user=self.user).order_by(
+            '-id'
+        ).values_list('author_id', flat=True))
+        self.assertEqual(self.walk(
+            '/api/users/subscriptions/?pagination=cursor&page_size=2'
+        ), expected)
+
+    def test_subscriptions_cursor(self):
+        url = '/api/users/subscriptions/'
+        for value, status in ((cursor(['x']), 404), (cursor([10 ** 6]), 200)):
+            with self.subTest(cursor=value):
+                response = self.client.get(
+                    url, {'pagination': 'cursor', 'cursor': value}
+                )
+                self.assertEqual(response.status_code, status)
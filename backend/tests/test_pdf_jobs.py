@@ -0,0 +1,59 @@
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import pdf_jobs
+from api.pdf import render_to_file
+from api.pdf_jobs import ProcessPoolQueue, ResultStore
+
+# Выполняется в процессе пула: какие пакеты приложения там загружены
+LOADED_PACKAGES = (
+    "sorted({name.split('.')[0] for name in __import__('sys').modules}"
+    " & {'django', 'rest_framework', 'recipes', 'users'})"
+)
+
+
+class ProcessPoolQueueTest(SimpleTestCase):
+
+    def test_renders_in_clean_process(self):
+        queue = ProcessPoolQueue(max_workers=1)
+        self.addCleanup(lambda: queue.executor.shutdown())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shopping_cart.pdf')
+            elapsed = queue.submit(
+                render_to_file, 'Список покупок', ['мука (г) — 200'], path
+            ).result(timeout=60)
+            self.assertGreater(elapsed, 0)
+            with open(path, 'rb') as pdf_file:
+                self.assertEqual(pdf_file.read(5), b'%PDF-')
+        # Процесс рендера не копирует воркер и не тянет Django
+        self.assertEqual(
+            queue.submit(eval, LOADED_PACKAGES).result(timeout=60), []
+        )
+
+    def test_recovers_from_dead_process(self):
+        queue = ProcessPoolQueue(max_workers=1)
+        self.addCleanup(lambda: queue.executor.shutdown())
+        # Процесс пула умирает, как при OOM
+        with self.assertRaises(BrokenProcessPool):
+            queue.submit(os._exit, 1).result(timeout=60)
+        self.assertEqual(queue.submit(abs, -1).result(timeout=60), 1)
+
+
+class RenderSubmitTest(SimpleTestCase):
+
+    def test_failed_submit_releases_marker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResultStore(directory=directory)
+            queue = mock.Mock()
+            queue.submit.side_effect = BrokenProcessPool('пул сломан')
+            with mock.patch.object(pdf_jobs, 'result_store', store):
+                with mock.patch.object(pdf_jobs, 'render_queue', queue):
+                    with self.assertRaises(BrokenProcessPool):
+                        pdf_jobs.render('Список покупок', ['соль (г) — 5'])
+            digest = pdf_jobs.cart_digest('Список покупок', ['соль (г) — 5'])
+            self.assertFalse(store.is_pending(digest))
+            self.assertTrue(store.claim(digest))
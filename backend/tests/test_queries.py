@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import CustomUser
+
+
+class RecipeQueryCountTest(TestCase):
+    """Список и карточка рецепта — за фиксированное число запросов,
+    сколько бы ни было рецептов, тегов и ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, author = (
+            CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass',
+                first_name=name, last_name=name
+            )
+            for name in ('reader', 'author')
+        )
+        tags = [
+            Tag.objects.create(name=f'tag{i}', color='#ffffff', slug=f'tag{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient{i}',
+                                      measurement_unit='г')
+            for i in range(6)
+        ]
+        for i in range(8):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=i + 1)
+                for ingredient in ingredients[i % 3:]
+            )
+        cls.recipe = recipe
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        # Ответы анонимам кешируются, считаются запросы без кеша
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+    def test_list(self):
+        # COUNT, рецепты с авторами, теги, ингредиенты и для
+        # пользователя — его избранное, корзина и подписки одним запросом
+        for client, queries in ((self.anonymous, 4), (self.authorized, 5)):
+            with self.subTest(authenticated=client is self.authorized):
+                with self.assertNumQueries(queries):
+                    response = client.get('/api/recipes/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 6)
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        for client, queries in ((self.anonymous, 3), (self.authorized, 4)):
+            with self.subTest(authenticated=client is self.authorized):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['ingredients']), 5)
+
+        data = self.authorized.get(url).json()
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertTrue(data['author']['is_subscribed'])
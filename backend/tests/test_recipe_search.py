@@ -0,0 +1,163 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.recipe_search import recipe_search_index, search_recipes
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+
+
+class RecipeSearchTestMixin:
+    """Рецепты, где «творог» встречается в названии, в ингредиентах
+    и в тексте."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='author', last_name='author'
+        )
+        cls.cottage_cheese = Ingredient.objects.create(
+            name='фермерский творог', measurement_unit='г'
+        )
+        cls.beet = Ingredient.objects.create(
+            name='молодая свекла', measurement_unit='г'
+        )
+        recipes = (
+            ('Блины с творогом', 'Тонкие блины на молоке',
+             cls.cottage_cheese),
+            ('Сырники', 'Сырники из творога', cls.cottage_cheese),
+            ('Борщ', 'Борщ с пампушками', cls.beet),
+            ('Запеканка', 'Запеканка с творогом', cls.beet),
+        )
+        cls.pancakes, cls.syrniki, cls.borscht, cls.casserole = (
+            cls.create_recipe(name, text, ingredient)
+            for name, text, ingredient in recipes
+        )
+
+    @classmethod
+    def create_recipe(cls, name, text, ingredient):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text=text,
+            image='recipes/images/recipe.png', cooking_time=10,
+            thumbnails={'source': 'recipes/images/recipe.png'}
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=100
+        )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        # Сигналы сбрасывают индекс после коммита, а его в TestCase нет
+        recipe_search_index.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+
+class RecipeSearchTest(RecipeSearchTestMixin, TestCase):
+    """Поиск рецептов одинаково ранжирует в PostgreSQL и в индексе
+    в памяти, который его заменяет в остальных базах."""
+
+    def test_requires_query(self):
+        response = self.client.get('/api/recipes/search/', {'q': ' '})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ranking(self):
+        # Название весит больше ингредиентов, ингредиенты — больше текста
+        self.assertEqual(self.search('творог'), [
+            self.pancakes.id, self.syrniki.id, self.casserole.id
+        ])
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('сырники творог'), [self.syrniki.id])
+        self.assertEqual(self.search('борщ творог'), [])
+
+    def test_stemming(self):
+        self.assertEqual(self.search('блинами'), [self.pancakes.id])
+        # При равном ранге новые рецепты идут первыми
+        self.assertEqual(self.search('Свёклой'), [
+            self.casserole.id, self.borscht.id
+        ])
+
+    def test_recipe_edit(self):
+        self.assertEqual(self.search('пампушки'), [self.borscht.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.borscht.id}/',
+                {'name': 'Борщ с творогом', 'text': 'Борщ со сметаной',
+                 'ingredients': [{'id': self.beet.id, 'amount': 300}]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('пампушки'), [])
+        self.assertEqual(self.search('творог'), [
+            self.pancakes.id, self.borscht.id, self.syrniki.id,
+            self.casserole.id
+        ])
+
+    def test_ingredient_edit(self):
+        self.assertEqual(self.search('свекла'), [
+            self.casserole.id, self.borscht.id
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.borscht.id}/',
+                {'ingredients': [
+                    {'id': self.cottage_cheese.id, 'amount': 300}
+                ]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('свекла'), [self.casserole.id])
+        self.assertIn(self.borscht.id, self.search('творог'))
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'search_vector и триггеры есть только в PostgreSQL')
+class PostgresSearchVectorTest(RecipeSearchTestMixin, TestCase):
+    """Триггеры миграции recipes.0013 обновляют search_vector без
+    участия ORM, а ts_rank ставит совпадение в названии первым."""
+
+    def matches(self, recipe, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT search_vector @@ plainto_tsquery(%s, %s) '
+                'FROM recipes_recipe WHERE id = %s',
+                ['russian', query, recipe.id]
+            )
+            return cursor.fetchone()[0]
+
+    def test_ingredients_change(self):
+        self.assertFalse(self.matches(self.borscht, 'творог'))
+        RecipeIngredient.objects.create(
+            recipe=self.borscht, ingredient=self.cottage_cheese, amount=100
+        )
+        self.assertTrue(self.matches(self.borscht, 'творог'))
+        RecipeIngredient.objects.filter(
+            recipe=self.borscht, ingredient=self.beet
+        ).delete()
+        self.assertFalse(self.matches(self.borscht, 'свекла'))
+
+    def test_ingredient_rename(self):
+        Ingredient.objects.filter(id=self.beet.id).update(name='свежий редис')
+        self.assertTrue(self.matches(self.borscht, 'редиса'))
+        self.assertFalse(self.matches(self.borscht, 'свекла'))
+
+    def test_rank(self):
+        recipes = list(search_recipes(Recipe.objects.all(), 'творогом'))
+        self.assertEqual(
+            [recipe.id for recipe in recipes],
+            [self.pancakes.id, self.syrniki.id, self.casserole.id]
+        )
+        ranks = [recipe.rank for recipe in recipes]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual(len(set(ranks)), len(ranks))
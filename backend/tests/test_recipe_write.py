@@ -0,0 +1,122 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.metrics import RECIPE_UPDATE_ROWS, registry
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import CustomUser
+
+
+def rows_touched():
+    return {
+        dict(labels)['table']: value
+        for name, labels, value in registry.snapshot()['counters']
+        if name == RECIPE_UPDATE_ROWS.name
+    }
+
+
+class RecipeWriteTest(TestCase):
+    """Проверка ингредиентов и тегов при изменении рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='author', last_name='author'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'проверочный ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            )
+            for i in range(3)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text',
+            image='recipes/images/recipe.png', cooking_time=10,
+            thumbnails={'source': 'recipes/images/recipe.png'}
+        )
+        cls.recipe.tags.set(cls.tags[:2])
+        for ingredient in cls.ingredients[:2]:
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=100
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def patch(self, data):
+        return self.client.patch(self.url, data, format='json')
+
+    def test_malformed_ingredients(self):
+        ingredient_id = self.ingredients[0].id
+        cases = (
+            ('abc', {'ingredients': ['Ожидался список ингредиентов']}),
+            ({'id': ingredient_id},
+             {'ingredients': ['Ожидался список ингредиентов']}),
+            ([1, {'id': ingredient_id, 'amount': 10}], {'ingredients': [
+                {'non_field_errors': ['Ожидался объект с полями id и amount']},
+                {},
+            ]}),
+            ([{'id': 'x', 'amount': 10}, 'abc'], {'ingredients': [
+                {'id': ['Ингредиент не найден']},
+                {'non_field_errors': ['Ожидался объект с полями id и amount']},
+            ]}),
+        )
+        for ingredients, errors in cases:
+            with self.subTest(ingredients=ingredients):
+                response = self.patch({'ingredients': ingredients})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), errors)
+
+    def ingredients_payload(self, *amounts):
+        return [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in zip(self.ingredients, amounts)
+        ]
+
+    def test_invalid_tags(self):
+        cases = (
+            (['x'], ['Ожидался список id тегов']),
+            ('1', ['Ожидался список id тегов']),
+            ([self.tags[0].id, 10 ** 6], [f'Теги не найдены: {10 ** 6}']),
+        )
+        for tags, errors in cases:
+            with self.subTest(tags=tags):
+                response = self.patch({
+                    'ingredients': self.ingredients_payload(100, 100),
+                    'tags': tags,
+                })
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'tags': errors})
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {tag.id for tag in self.tags[:2]}
+        )
+
+    def test_rows_touched_metric(self):
+        before = rows_touched()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.patch({
+                'ingredients': self.ingredients_payload(100, 150),
+                'tags': [self.tags[0].id, str(self.tags[2].id)],
+            })
+        self.assertEqual(response.status_code, 200)
+        after = rows_touched()
+        self.assertEqual(
+            {
+                table: after[table] - before.get(table, 0)
+                for table in ('recipe', 'ingredients', 'tags')
+            },
+            {'recipe': 0, 'ingredients': 1, 'tags': 2}
+        )
+        self.assertEqual(
+            [tag['id'] for tag in response.json()['tags']],
+            [self.tags[0].id, self.tags[2].id]
+        )
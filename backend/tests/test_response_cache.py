@@ -0,0 +1,48 @@
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import RECIPES, get_version
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class AnonymousResponseCacheTest(TestCase):
+    """Кеш ответов рецептов для анонимов и изменения автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='Старое', last_name='Имя'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text',
+            image='recipes/images/recipe.png', cooking_time=10,
+            thumbnails={'source': 'recipes/images/recipe.png'}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def author_names(self):
+        listed = self.client.get('/api/recipes/').json()['results'][0]
+        detail = self.client.get(f'/api/recipes/{self.recipe.id}/').json()
+        return [
+            listed['author']['first_name'], detail['author']['first_name']
+        ]
+
+    def test_author_rename(self):
+        self.assertEqual(self.author_names(), ['Старое', 'Старое'])
+        self.author.first_name = 'Новое'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.author_names(), ['Новое', 'Новое'])
+
+    def test_login_keeps_version(self):
+        version = get_version(RECIPES)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.author)
+        self.assertEqual(get_version(RECIPES), version)
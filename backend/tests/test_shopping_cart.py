@@ -0,0 +1,34 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+POLL_URL = f'{DOWNLOAD_URL}{"0" * 64}/'
+
+
+class ShoppingCartErrorTest(TestCase):
+    """Ошибки выгрузки списка покупок приходят в JSON при любом формате."""
+
+    def assert_json_error(self, client, url, export_format, status):
+        response = client.get(url, {'format': export_format})
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+    def test_anonymous(self):
+        client = APIClient()
+        for export_format in ('pdf', 'txt', 'csv'):
+            with self.subTest(format=export_format):
+                self.assert_json_error(
+                    client, DOWNLOAD_URL, export_format, 401
+                )
+        self.assert_json_error(client, POLL_URL, 'pdf', 401)
+
+    def test_unknown_pdf(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+            first_name='buyer', last_name='buyer'
+        ))
+        self.assert_json_error(client, POLL_URL, 'pdf', 404)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.images import ImmediateQueue, make_thumbnails
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+def image_file(color):
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+class ThumbnailFilesTest(TestCase):
+    """Файлы миниатюр не остаются в хранилище после замены картинки."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.thumbnails_dir = os.path.join(media_root, 'thumbnails')
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='author', last_name='author'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=10,
+            image=self.save_image('red')
+        )
+
+    def save_image(self, color):
+        return default_storage.save(
+            f'recipes/images/{color}.png', image_file(color)
+        )
+
+    def stored_thumbnails(self):
+        return {
+            f'thumbnails/{name}' for name in os.listdir(self.thumbnails_dir)
+        }
+
+    def thumbnail_names(self, thumbnails):
+        return {name for size, name in thumbnails.items() if size != 'source'}
+
+    def test_replaced_image(self):
+        first = make_thumbnails(self.recipe.id, self.recipe.image.name)
+        self.assertEqual(
+            self.stored_thumbnails(), self.thumbnail_names(first)
+        )
+        image = self.save_image('blue')
+        Recipe.objects.filter(pk=self.recipe.id).update(image=image)
+        second = make_thumbnails(self.recipe.id, image)
+        self.assertEqual(
+            self.stored_thumbnails(), self.thumbnail_names(second)
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.thumbnails, second)
+
+    def test_image_replaced_while_building(self):
+        old_image = self.recipe.image.name
+        Recipe.objects.filter(pk=self.recipe.id).update(
+            image=self.save_image('green')
+        )
+        self.assertIsNone(make_thumbnails(self.recipe.id, old_image))
+        self.assertEqual(self.stored_thumbnails(), set())
+
+    @mock.patch('recipes.signals.image_queue', ImmediateQueue())
+    def test_deleted_recipe(self):
+        make_thumbnails(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.stored_thumbnails(), set())
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes import timeline
+from recipes.models import Follow, Recipe, TimelineEntry
+from users.models import CustomUser
+
+
+class TimelineTest(TestCase):
+    """Лента подписок сверяется с соединением Follow и Recipe."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='pass', first_name='user', last_name='user'
+            )
+            for i in range(6)
+        ]
+        for i in range(24):
+            cls.create_recipe(cls.users[i % 6])
+        for user in cls.users:
+            for author in cls.users:
+                if author != user:
+                    Follow.objects.create(user=user, author=author)
+
+    @classmethod
+    def create_recipe(cls, author):
+        return Recipe.objects.create(
+            author=author, name='recipe', text='text',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+
+    def feed(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        ids = []
+        url = '/api/recipes/feed/?page_size=5'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def assert_feeds(self):
+        for user in self.users:
+            with self.subTest(user=user.username):
+                self.assertEqual(self.feed(user), list(
+                    Recipe.objects.filter(
+                        author__author__user=user
+                    ).order_by('-pub_date', '-id').values_list('id', flat=True)
+                ))
+
+    def author_entries(self, author):
+        return TimelineEntry.objects.filter(author=author).count()
+
+    def test_fan_out_on_write(self):
+        self.assertEqual(TimelineEntry.objects.count(), 24 * 5)
+        recipe = self.create_recipe(self.users[0])
+        self.assertEqual(
+            TimelineEntry.objects.filter(recipe=recipe).count(), 5
+        )
+        Follow.objects.filter(
+            user=self.users[1], author=self.users[0]
+        ).delete()
+        self.assert_feeds()
+        Follow.objects.create(user=self.users[1], author=self.users[0])
+        self.assert_feeds()
+        recipe.delete()
+        self.assert_feeds()
+
+    @mock.patch('recipes.timeline.TIMELINE_FANOUT_LIMIT', 5)
+    def test_popular_authors_read_on_read(self):
+        # У каждого автора пять подписчиков: все популярны, строки,
+        # разложенные до снижения порога, в ленте не читаются
+        self.assert_feeds()
+        author = self.users[2]
+        self.create_recipe(author)
+        self.assertEqual(self.author_entries(author), 0)
+        self.assert_feeds()
+
+        Follow.objects.filter(user=self.users[3], author=author).delete()
+        self.assertEqual(self.author_entries(author), 5 * 4)
+        self.assert_feeds()
+
+        Follow.objects.create(user=self.users[3], author=author)
+        self.assertEqual(self.author_entries(author), 0)
+        self.assert_feeds()
+
+    @mock.patch('recipes.timeline.TIMELINE_FANOUT_LIMIT', 5)
+    def test_crossing_skipped_by_concurrent_changes(self):
+        author = self.users[2]
+        Follow.objects.filter(user=self.users[3], author=author).delete()
+        # Параллельные подписки перешагнули порог, минуя значение 5
+        CustomUser.objects.filter(pk=author.pk).update(followers_count=6)
+        Follow.objects.filter(user=self.users[4], author=author).delete()
+        CustomUser.objects.filter(pk=author.pk).update(followers_count=7)
+        Follow.objects.create(user=self.users[4], author=author)
+        self.assertEqual(self.author_entries(author), 0)
+        # И обратно, минуя значение 4
+        CustomUser.objects.filter(pk=author.pk).update(followers_count=4)
+        Follow.objects.filter(user=self.users[5], author=author).delete()
+        self.assertEqual(self.author_entries(author), 3 * 4)
+        self.assert_feeds()
+
+    def test_rebuild(self):
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertEqual(TimelineEntry.objects.count(), 24 * 5)
+        self.assert_feeds()
@@ -14,7 +14,8 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 class CustomUserAdmin(BaseUserAdmin):
-    list_display = ('email', 'username', 'first_name', 'last_name')
+    list_display = ('email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count')
     search_fields = ('email', 'username', 'first_name', 'last_name')
 
 
@@ -23,15 +24,12 @@ admin.site.register(CustomUser, CustomUserAdmin)
 
 class RecipeAdmin(ModelAdmin):
     list_display = ['id', 'name', 'author', 'favorites_count']
+    list_select_related = ['author']
     search_fields = ['name', 'author__username']
     list_filter = ['tags']
+    readonly_fields = ['favorites_count', 'shopping_cart_count', 'thumbnails']
     inlines = (RecipeIngredientInline, )
 
-    def favorites_count(self, obj):
-        if obj.favorites.exists():
-            return obj.favorites.count()
-        return 0
-
 
 admin.site.register(Recipe, RecipeAdmin)
 
@@ -12,3 +12,7 @@ class CustomUser(AbstractUser):
                                 validators=(UnicodeUsernameValidator,))
     first_name = models.CharField(max_length=150, verbose_name='Имя')
     last_name = models.CharField(max_length=150, verbose_name='Фамилия')
+    recipes_count = models.PositiveIntegerField(default=0,
+                                                verbose_name='Рецептов')
+    followers_count = models.PositiveIntegerField(default=0,
+                                                  verbose_name='Подписчиков')